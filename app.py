@@ -4,13 +4,39 @@ import json
 from scrape_market import (
     scrape_yandex_market_selenium,
     setup_driver,
-    scrape_yandex_market_alternatives,
-    scrape_price_from_product_page,
+    coalesced_alternatives,
+    coalesced_product_price,
+    compact_item,
+    load_selector_stats,
+    save_selector_stats,
+    SCRAPE_FLIGHTS,
+    build_router,
+)
+from query_index import build_index_from_items
+from search_index import SearchIndex
+from assortment import (
+    EMOTION,
+    GIFT,
+    build_slots,
+    load_alternatives_cache,
+    save_alternatives_cache,
+    solve_assortment,
+)
+from catalog import (
+    SORT_OPTIONS,
+    catalog_stats,
+    catalog_to_frame,
+    filter_catalog,
+    load_items,
+    sort_catalog,
 )
 import time
 import os
 import re
 
+# Локальные каталоги, которые опрашиваются вместе с Маркетом (формат new_emotions.json)
+EXPERIENCE_CATALOGS = ["new_emotions.json"]
+
 # --- Page Config ---
 st.set_page_config(page_title="Подбор подарков", page_icon="🎁", layout="wide")
 
@@ -65,12 +91,41 @@ def load_data():
 
 
 def load_data():
-    """Loads gift data from a JSON file."""
-    try:
-        with open("podarki.json", "r", encoding="utf-8") as f:
-            return json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
-        return []
+    """Loads gift data from a JSON file (through the columnar cache for large files)."""
+    data = load_items("podarki.json")
+    # Убираем трекинговые хвосты из ссылок; файл сожмётся при следующем сохранении
+    return [compact_item(item) for item in data]
+
+
+def index_item(index, comment=""):
+    """
+    Adds or refreshes the catalog row at position index in the search index.
+    Rows are keyed by position, like comments; deleting a row shifts the
+    positions, so the index is rebuilt then.
+    """
+    item = st.session_state.gift_data[index]
+    st.session_state.search_index.add(
+        ("item", index),
+        item.get("name"),
+        item.get("query"),
+        comment or item.get("comment"),
+    )
+
+
+def index_alternatives(query, alternatives):
+    """Indexes the names of cached alternatives under their query."""
+    st.session_state.search_index.add(
+        ("alt", query), *[alt.get("name") for alt in alternatives]
+    )
+
+
+def build_search_index():
+    """Builds the search index over the catalog, comments and cached alternatives."""
+    st.session_state.search_index = SearchIndex()
+    for i in range(len(st.session_state.gift_data)):
+        index_item(i, st.session_state.comments.get(i, ""))
+    for query, alternatives in st.session_state.alternatives_cache.items():
+        index_alternatives(query, alternatives)
 
 
 # --- State Management ---
@@ -86,6 +141,15 @@ if "editing_comment" not in st.session_state:
     st.session_state.editing_comment = {}  # Словарь для отслеживания режима редактирования {index: True/False}
 if "driver" not in st.session_state:
     st.session_state.driver = None
+    load_selector_stats()  # Порядок селекторов, выученный в прошлых запусках
+if "source_router" not in st.session_state:
+    st.session_state.source_router = None  # Создаётся вместе с браузером при парсинге
+if "alternatives_cache" not in st.session_state:
+    st.session_state.alternatives_cache = load_alternatives_cache()  # {query: [items]}
+if "assortment" not in st.session_state:
+    st.session_state.assortment = None  # Результат последнего подбора ассортимента
+if "search_index" not in st.session_state:
+    build_search_index()  # Полнотекстовый индекс по списку и вариантам замены
 
 # После загрузки данных убедимся, что комментарии из файла загружены в состояние
 if "gift_data" in st.session_state and hasattr(st.session_state, 'comments_loaded') == False:
@@ -121,29 +185,49 @@ if st.sidebar.button("Начать парсинг"):
             st.success("Браузер готов. Начинаю парсинг...")
             progress_bar = st.progress(0)
 
-            # Сохраняем начальное количество элементов для корректного добавления комментариев
-            initial_count = len(st.session_state.gift_data)
+            # Маркет и локальные каталоги впечатлений; источник, ответивший
+            # на запрос, запоминается и спрашивается первым
+            if st.session_state.source_router is None:
+                st.session_state.source_router = build_router(
+                    st.session_state.driver, EXPERIENCE_CATALOGS
+                )
+            router = st.session_state.source_router
+
+            # Индекс уже найденных запросов: дубликаты не ищем повторно
+            query_index = build_index_from_items(st.session_state.gift_data)
+            known_products = {
+                item.get("productId")
+                for item in st.session_state.gift_data
+                if item.get("productId")
+            }
 
             for i, gift_name in enumerate(gift_list):
-                st.write(f"Ищу: '{gift_name}'...")
-                name, price, url, image_url = scrape_yandex_market_selenium(
-                    st.session_state.driver, gift_name
-                )
+                cached = query_index.lookup(gift_name)
+                if cached:
+                    st.write(f"♻️ Уже есть: {cached.get('name')} (для '{gift_name}')")
+                    progress_bar.progress((i + 1) / len(gift_list))
+                    continue
 
-                if name:
-                    st.session_state.gift_data.append(
-                        {
-                            "name": name,
-                            "price": price,
-                            "purchaseUrl": url,
-                            "imageUrl": image_url,
-                            "query": gift_name,
-                        }
-                    )
+                st.write(f"Ищу: '{gift_name}'...")
+                new_item, source_name = router.lookup(gift_name)
+
+                if new_item:
+                    name = new_item["name"]
+                    product_id = new_item.get("productId")
+                    if product_id in known_products:
+                        st.write(f"♻️ Товар уже в списке: {name}")
+                        query_index.add(gift_name, new_item)
+                        progress_bar.progress((i + 1) / len(gift_list))
+                        continue
+                    if product_id:
+                        known_products.add(product_id)
+                    st.session_state.gift_data.append(new_item)
+                    query_index.add(gift_name, new_item)
                     # Добавляем пустой комментарий для нового элемента
-                    new_index = initial_count + i
+                    new_index = len(st.session_state.gift_data) - 1
                     st.session_state.comments[new_index] = ""
-                    st.write(f"✅ Найдено: {name}")
+                    index_item(new_index)
+                    st.write(f"✅ Найдено: {name} ({source_name})")
                 else:
                     st.write(f"❌ Не удалось найти '{gift_name}'")
 
@@ -151,6 +235,13 @@ if st.sidebar.button("Начать парсинг"):
                 time.sleep(1)
 
             st.success("Парсинг завершен!")
+            save_selector_stats()
+            router.save()
+            if query_index.saved:
+                st.info(
+                    f"Повторных запросов пропущено: {query_index.saved} "
+                    f"(точных: {query_index.exact_hits}, похожих: {query_index.near_hits})"
+                )
             save_data(st.session_state.gift_data)
         else:
             st.error(
@@ -159,12 +250,129 @@ if st.sidebar.button("Начать парсинг"):
     else:
         st.sidebar.warning("Пожалуйста, введите хотя бы одну идею для подарка.")
 
+# Одинаковые одновременные загрузки из разных сессий выполняются один раз
+if SCRAPE_FLIGHTS.saved:
+    st.sidebar.caption(
+        f"Совпавших одновременных загрузок: {SCRAPE_FLIGHTS.saved} "
+        f"(всего загрузок: {SCRAPE_FLIGHTS.loads})"
+    )
+
+st.sidebar.header("Подбор ассортимента")
+st.sidebar.caption(
+    "Выбирает по одному варианту на позицию из уже найденных товаров и "
+    "сохранённых вариантов замены, без новых поисков."
+)
+assortment_budget = st.sidebar.number_input(
+    "Общий бюджет, ₽ (0 — без ограничения)", min_value=0, value=0, step=10000
+)
+band_cols = st.sidebar.columns(2)
+assortment_min_price = band_cols[0].number_input("Цена от, ₽", min_value=0, value=0, step=500)
+assortment_max_price = band_cols[1].number_input(
+    "Цена до, ₽ (0 — без ограничения)", min_value=0, value=0, step=500
+)
+quota_cols = st.sidebar.columns(2)
+gift_quota = quota_cols[0].number_input("Подарков", min_value=0, value=200, step=10)
+emotion_quota = quota_cols[1].number_input("Впечатлений", min_value=0, value=50, step=5)
+
+if st.sidebar.button("Подобрать"):
+    slots = build_slots(
+        st.session_state.gift_data, st.session_state.alternatives_cache
+    )
+    st.session_state.assortment = solve_assortment(
+        slots,
+        budget=assortment_budget or None,
+        min_price=assortment_min_price or None,
+        max_price=assortment_max_price or None,
+        quotas={GIFT: gift_quota, EMOTION: emotion_quota},
+    )
+
+if st.session_state.assortment:
+    result = st.session_state.assortment
+    st.sidebar.write(
+        f"Выбрано позиций: {len(result['assignment'])}, сумма: {result['total']} ₽"
+    )
+    if result["over_budget"]:
+        over_budget = f"{result['over_budget']:,}".replace(",", " ")
+        st.sidebar.error(
+            f"Бюджет превышен на {over_budget} ₽: найденные варианты "
+            "не укладываются в него"
+        )
+    if result["shortage"]:
+        missing = ", ".join(
+            f"{'подарков' if category == GIFT else 'впечатлений'}: {count}"
+            for category, count in result["shortage"].items()
+        )
+        st.sidebar.warning(f"Не хватает подходящих позиций — {missing}")
+    if result["unfilled"]:
+        st.sidebar.write(f"Без подходящих вариантов: {len(result['unfilled'])}")
+    changed = [
+        index
+        for index, chosen in result["assignment"].items()
+        if index < len(st.session_state.gift_data)
+        and chosen is not st.session_state.gift_data[index]
+    ]
+    st.sidebar.write(f"Замен в списке: {len(changed)}")
+    if st.sidebar.button("Применить подбор", disabled=not changed):
+        for index in changed:
+            st.session_state.gift_data[index] = result["assignment"][index]
+            index_item(index, st.session_state.comments.get(index, ""))
+            st.session_state.alternatives.pop(index, None)
+        st.session_state.assortment = None
+        save_data(st.session_state.gift_data)
+        st.rerun()
+
 st.header("Список найденных подарков")
 
 if st.session_state.gift_data:
     total_items = len(st.session_state.gift_data)
     st.markdown(f"**Всего позиций: {total_items}**")
 
+    # Типизированная таблица для быстрой сортировки, фильтра и сводки
+    catalog_frame = catalog_to_frame(st.session_state.gift_data)
+    known_prices = catalog_frame["price"].dropna()
+    max_catalog_price = int(known_prices.max()) if len(known_prices) else 0
+
+    search_text = st.text_input(
+        "Поиск по названию, запросу, комментариям и вариантам замены"
+    )
+    control_cols = st.columns([2, 1, 1, 1])
+    sort_option = control_cols[0].selectbox("Сортировка", list(SORT_OPTIONS))
+    min_price = control_cols[1].number_input("Цена от", min_value=0, value=0, step=500)
+    max_price = control_cols[2].number_input(
+        "Цена до", min_value=0, value=max_catalog_price, step=500
+    )
+    include_unpriced = control_cols[3].checkbox("Без цены", value=True)
+
+    view = sort_catalog(
+        filter_catalog(catalog_frame, min_price, max_price, include_unpriced),
+        sort_option,
+    )
+
+    if search_text.strip():
+        search_started = time.perf_counter()
+        hits = st.session_state.search_index.search(search_text)
+        hit_items = {doc_id[1] for doc_id in hits if doc_id[0] == "item"}
+        hit_queries = {doc_id[1] for doc_id in hits if doc_id[0] == "alt"}
+        # Позиции списка: совпал сам товар или один из его вариантов замены
+        matched = [
+            i
+            for i, item in enumerate(st.session_state.gift_data)
+            if i in hit_items
+            or (item.get("query") or item.get("name")) in hit_queries
+        ]
+        view = view[view.index.isin(matched)]
+        search_ms = (time.perf_counter() - search_started) * 1000
+        st.caption(f"Найдено: {len(matched)} за {search_ms:.1f} мс")
+    stats = catalog_stats(view)
+
+    stat_cols = st.columns(4)
+    stat_cols[0].metric("Показано", stats["count"])
+    stat_cols[1].metric("С ценой", stats["priced"])
+    stat_cols[2].metric("Сумма, ₽", f"{stats['total']:,}".replace(",", " "))
+    stat_cols[3].metric("Средняя цена, ₽", f"{stats['average']:,}".replace(",", " "))
+    with st.expander("Разбивка по ценам"):
+        st.dataframe(stats["bands"])
+
     header_cols = st.columns([1, 3, 1, 2, 1, 1, 1])
     header_cols[0].write("**Фото**")
     header_cols[1].write("**Название**")
@@ -175,7 +383,8 @@ if st.session_state.gift_data:
     header_cols[6].write("")  # Placeholder for replace button
 
     indices_to_delete = []
-    for i, item in enumerate(st.session_state.gift_data):
+    for i in view.index:
+        item = st.session_state.gift_data[i]
         cols = st.columns([1, 3, 1, 2, 1, 1, 1, 1])  # Добавляем еще одну колонку для комментариев
 
         # Display main item
@@ -204,10 +413,15 @@ if st.session_state.gift_data:
 
                 if st.session_state.driver:
                     st.session_state.alternatives[i] = (
-                        scrape_yandex_market_alternatives(
-                            st.session_state.driver, query
-                        )
+                        coalesced_alternatives(st.session_state.driver, query)
                     )
+                    # Запоминаем варианты для подбора ассортимента
+                    if st.session_state.alternatives[i]:
+                        st.session_state.alternatives_cache[query] = (
+                            st.session_state.alternatives[i]
+                        )
+                        save_alternatives_cache(st.session_state.alternatives_cache)
+                        index_alternatives(query, st.session_state.alternatives[i])
                 else:
                     st.error("Браузер не запущен.")
             pass  # Убираем rerun, чтобы избежать лишних перезагрузок
@@ -241,6 +455,7 @@ if st.session_state.gift_data:
             save_comment_key = f"save_comment_{i}"
             if st.button("Сохранить комментарий", key=save_comment_key):
                 st.session_state.comments[i] = new_comment
+                index_item(i, new_comment)
                 st.session_state.editing_comment[i] = False
                 save_data(st.session_state.gift_data)  # Сохраняем данные
                 st.rerun()  # Обновляем страницу для отображения изменений
@@ -277,7 +492,7 @@ if st.session_state.gift_data:
                             if st.session_state.driver:
                                 price = None
                                 if alt_item.get("purchaseUrl"):
-                                    price = scrape_price_from_product_page(
+                                    price = coalesced_product_price(
                                         st.session_state.driver,
                                         alt_item.get("purchaseUrl"),
                                     )
@@ -293,6 +508,8 @@ if st.session_state.gift_data:
                                     # update fields if found
                                     if url:
                                         alt_item["purchaseUrl"] = url
+                                        # Новая ссылка - новый productId для поиска дублей
+                                        alt_item = compact_item(alt_item)
                                     if image_url:
                                         alt_item["imageUrl"] = image_url
 
@@ -310,6 +527,7 @@ if st.session_state.gift_data:
                     
                     # Save chosen alternative (with price if found)
                     st.session_state.gift_data[i] = alt_item
+                    index_item(i, comment_for_transfer)
                     if i in st.session_state.alternatives:
                         del st.session_state.alternatives[i]
                     
@@ -351,6 +569,8 @@ if st.session_state.gift_data:
                     new_editing_comment[k] = v
             st.session_state.comments = new_comments
             st.session_state.editing_comment = new_editing_comment
+            # Позиции строк сдвинулись - перестраиваем индекс поиска
+            build_search_index()
             save_data(st.session_state.gift_data)
             st.rerun()
 
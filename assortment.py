@@ -0,0 +1,289 @@
+import bisect
+import json
+import re
+
+
+# Признаки впечатлений (услуг/опытов) в запросе или названии. Ключи
+# привязаны к началу слова, а короткие основы ограничены формами слова,
+# иначе товары вроде «Массажер», «СПА-бассейн» или «Набор для дегустации
+# виски» и «скульптура» попадают во впечатления
+EMOTION_KEYWORDS = re.compile(
+    r"(?<!\w)(?:сертификат|полет|полёт|прыжок|прыжки|парашют|аэротруб|"
+    r"мастер-класс|картинг|дегустаци(?:я|онн)|экскурси|билет|урок|катание|"
+    r"прогулк|фотопрогулк|квест|массаж\b|фотосесси|тур\b|вертолет|вертолёт|"
+    r"скалолаз|сплав|бан[яиюе]\b|саун|(?:спа|spa)[- ](?:день|салон|программ|для)|"
+    r"посещение|поход в|пейнтбол|театр\b|концерт|курс\b|гонки|занятие|класс в|"
+    r"медитация в|караоке|аквапарк|зоопарк|музе[йя]|цирк(?:а|е)?\b)"
+)
+
+GIFT = "gift"
+EMOTION = "emotion"
+
+
+def guess_category(item):
+    """Guesses whether a catalog row is a physical gift or an experience."""
+    text = f"{item.get('query') or ''} {item.get('name') or ''}".lower()
+    return EMOTION if EMOTION_KEYWORDS.search(text) else GIFT
+
+
+def item_price(item):
+    """Returns the item price as int, or None if it is missing."""
+    digits = re.sub(r"\D", "", str(item.get("price") or ""))
+    return int(digits) if digits else None
+
+
+def load_alternatives_cache(path="alternatives.json"):
+    """Loads cached alternatives {query: [items]} from disk."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def save_alternatives_cache(cache, path="alternatives.json"):
+    """Saves cached alternatives {query: [items]} to disk."""
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(cache, f, ensure_ascii=False, indent=4)
+
+
+def build_slots(items, alternatives_cache=None):
+    """
+    Builds one slot per catalog row. Candidates are the current item plus the
+    cached alternatives for its query; duplicates by productId/URL are dropped.
+    """
+    alternatives_cache = alternatives_cache or {}
+    slots = []
+    for i, item in enumerate(items):
+        query = item.get("query") or item.get("name")
+        candidates = []
+        seen = set()
+        for candidate in [item] + alternatives_cache.get(query, []):
+            key = candidate.get("productId") or candidate.get("purchaseUrl")
+            if key and key in seen:
+                continue
+            seen.add(key)
+            candidates.append(candidate)
+        slots.append(
+            {"index": i, "category": guess_category(item), "candidates": candidates}
+        )
+    return slots
+
+
+def _item_key(item):
+    """Identity of a product for duplicate checks; None if it has none."""
+    return item.get("productId") or item.get("purchaseUrl")
+
+
+def _closest_free(prices, keys, target, used):
+    """
+    Position of the price closest to target among candidates whose key is
+    not in used, or None. prices is sorted.
+    """
+    right = bisect.bisect_left(prices, target)
+    left = right - 1
+    while left >= 0 or right < len(prices):
+        if left >= 0 and keys[left] in used:
+            left -= 1
+        elif right < len(prices) and keys[right] in used:
+            right += 1
+        elif left < 0:
+            return right
+        elif right >= len(prices):
+            return left
+        else:
+            return right if prices[right] - target < target - prices[left] else left
+    return None
+
+
+def _free_at_most(prices, keys, limit, used, own):
+    """
+    Position of the highest price <= limit among candidates that are not
+    used by another slot (own is the slot's current key), or None.
+    """
+    pos = bisect.bisect_right(prices, limit) - 1
+    while pos >= 0:
+        if keys[pos] is None or keys[pos] == own or keys[pos] not in used:
+            return pos
+        pos -= 1
+    return None
+
+
+def _cheapest_free(keys, used, own):
+    """Position of the cheapest candidate not used by another slot, or None."""
+    for pos, key in enumerate(keys):
+        if key is None or key == own or key not in used:
+            return pos
+    return None
+
+
+def _first_free(keys, order, used):
+    """First candidate in page order whose key is not used, or None."""
+    for pos in order:
+        if keys[pos] is None or keys[pos] not in used:
+            return pos
+    return None
+
+
+def _swap(keys, choice, used, index, pos):
+    """Moves a slot to another candidate, keeping the set of used keys."""
+    old_key = keys[index][choice[index]]
+    if old_key is not None:
+        used.discard(old_key)
+    if keys[index][pos] is not None:
+        used.add(keys[index][pos])
+    choice[index] = pos
+
+
+def _fit_budget(prices, keys, choice, used, total, budget):
+    """
+    Greedy local search under the budget. Each step applies the swap that
+    gives the highest total not over the budget; while the total is over
+    and no single swap brings it under, the swap that lowers it most is
+    applied instead. A swap never takes a product used by another slot.
+    Mutates choice and used and returns the new total.
+    """
+    max_steps = 10 * len(choice)
+    for _ in range(max_steps):
+        slack = budget - total
+        fit_total, fit_index, fit_pos = None, None, None
+        cut_total, cut_index, cut_pos = None, None, None
+        for index, pos in choice.items():
+            slot_prices = prices[index]
+            slot_keys = keys[index]
+            current = slot_prices[pos]
+            own = slot_keys[pos]
+            new_pos = _free_at_most(slot_prices, slot_keys, current + slack, used, own)
+            if new_pos is not None and new_pos != pos:
+                new_total = total - current + slot_prices[new_pos]
+                if fit_total is None or new_total > fit_total:
+                    fit_total, fit_index, fit_pos = new_total, index, new_pos
+            if slack < 0 and fit_index is None:
+                new_pos = _cheapest_free(slot_keys, used, own)
+                new_total = total - current + slot_prices[new_pos]
+                if cut_total is None or new_total < cut_total:
+                    cut_total, cut_index, cut_pos = new_total, index, new_pos
+        if fit_index is not None and (slack < 0 or fit_total > total):
+            _swap(keys, choice, used, fit_index, fit_pos)
+            total = fit_total
+        elif slack < 0 and cut_index is not None and cut_total < total:
+            _swap(keys, choice, used, cut_index, cut_pos)
+            total = cut_total
+        else:
+            break
+    return total
+
+
+def _fill_slots(slots, prices, keys, page_order, quotas, target):
+    """
+    Fills slots in order within the category quotas, each with the free
+    candidate closest to target (or the first free one in page order when
+    target is None), so a product fills at most one slot. Returns (choice,
+    used keys, {category: filled count}, slots left empty by duplicates).
+    """
+    choice = {}
+    used = set()
+    taken = {}
+    duplicates = []
+    for slot in slots:
+        index = slot["index"]
+        category = slot["category"]
+        if index not in prices:
+            continue
+        if quotas and taken.get(category, 0) >= quotas.get(category, 0):
+            continue
+        if target is not None:
+            pos = _closest_free(prices[index], keys[index], target, used)
+        else:
+            pos = _first_free(keys[index], page_order[index], used)
+        if pos is None:
+            duplicates.append(index)
+            continue
+        choice[index] = pos
+        if keys[index][pos] is not None:
+            used.add(keys[index][pos])
+        taken[category] = taken.get(category, 0) + 1
+    return choice, used, taken, duplicates
+
+
+def solve_assortment(slots, budget=None, min_price=None, max_price=None, quotas=None):
+    """
+    Picks one candidate per slot.
+
+    Only priced candidates within [min_price, max_price] are considered.
+    quotas ({category: count}) limits how many slots of each category are
+    filled, in slot order; without quotas every slot is filled. A product
+    (by productId or URL) fills at most one slot; a slot whose candidates are
+    all taken counts as unfilled. Without a budget the first viable
+    candidate of each slot is kept. The total budget is a limit: the picks
+    start near the average price per slot and are then improved greedily,
+    one swap at a time, getting as close to the budget as possible without
+    going over it.
+
+    Returns a dict with 'assignment' ({slot index: item}), 'total',
+    'over_budget' (how much the cheapest picks found still exceed the
+    budget, 0 if they fit), 'unfilled' (slot indices without a viable
+    candidate) and 'shortage' ({category: missing count}).
+    """
+    # Для каждого слота: подходящие кандидаты, отсортированные по цене
+    prices = {}
+    keys = {}
+    candidates = {}
+    page_order = {}
+    unfilled = []
+    for slot in slots:
+        priced = []
+        for order, candidate in enumerate(slot["candidates"]):
+            price = item_price(candidate)
+            if price is None:
+                continue
+            if min_price is not None and price < min_price:
+                continue
+            if max_price is not None and price > max_price:
+                continue
+            priced.append((price, order, candidate))
+        if not priced:
+            unfilled.append(slot["index"])
+            continue
+        priced.sort(key=lambda entry: (entry[0], entry[1]))
+        prices[slot["index"]] = [entry[0] for entry in priced]
+        keys[slot["index"]] = [_item_key(entry[2]) for entry in priced]
+        candidates[slot["index"]] = [entry[2] for entry in priced]
+        page_order[slot["index"]] = sorted(
+            range(len(priced)), key=lambda pos: priced[pos][1]
+        )
+
+    # Сколько слотов будет заполнено - для стартовой цены на слот
+    if quotas:
+        available = {}
+        for slot in slots:
+            if slot["index"] in prices:
+                available[slot["category"]] = available.get(slot["category"], 0) + 1
+        expected = sum(
+            min(count, available.get(category, 0)) for category, count in quotas.items()
+        )
+    else:
+        expected = len(prices)
+    target = budget / expected if budget is not None and expected else None
+
+    choice, used, taken, duplicates = _fill_slots(
+        slots, prices, keys, page_order, quotas, target
+    )
+    total = sum(prices[index][pos] for index, pos in choice.items())
+    over_budget = 0
+    if budget is not None and choice:
+        total = _fit_budget(prices, keys, choice, used, total, budget)
+        over_budget = max(0, total - budget)
+
+    shortage = {}
+    for category, count in (quotas or {}).items():
+        if taken.get(category, 0) < count:
+            shortage[category] = count - taken.get(category, 0)
+
+    return {
+        "assignment": {index: candidates[index][pos] for index, pos in choice.items()},
+        "total": total,
+        "over_budget": over_budget,
+        "unfilled": sorted(unfilled + duplicates),
+        "shortage": shortage,
+    }
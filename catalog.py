@@ -0,0 +1,213 @@
+import json
+import os
+import re
+
+import pandas as pd
+
+
+CATALOG_COLUMNS = [
+    "name",
+    "price",
+    "purchaseUrl",
+    "imageUrl",
+    "query",
+    "productId",
+    "comment",
+]
+TEXT_COLUMNS = ["name", "purchaseUrl", "imageUrl", "query", "productId", "comment"]
+# Поля, которые остаются в строке и без значения
+REQUIRED_COLUMNS = ("name", "price", "purchaseUrl", "imageUrl")
+
+# Ценовые диапазоны для сводки (верхняя граница не включается)
+PRICE_BANDS = [0, 1000, 3000, 5000, 10000, 20000, 50000, float("inf")]
+PRICE_BAND_LABELS = [
+    "до 1 000",
+    "1 000–3 000",
+    "3 000–5 000",
+    "5 000–10 000",
+    "10 000–20 000",
+    "20 000–50 000",
+    "от 50 000",
+]
+
+# JSON меньше этого размера читается быстрее, чем кэш с переводом в строки
+CACHE_MIN_BYTES = 1_000_000
+
+SORT_OPTIONS = {
+    "Как в списке": None,
+    "Цена ↑": ("price", True),
+    "Цена ↓": ("price", False),
+    "Название": ("name", True),
+}
+
+
+def catalog_to_frame(items):
+    """
+    Converts catalog rows (list of dicts) into a typed DataFrame.
+    Prices become nullable integers; the index is the position in the list,
+    so rows of a filtered view can be mapped back to the original items.
+    """
+    frame = pd.DataFrame.from_records(
+        [item if isinstance(item, dict) else {} for item in items],
+        columns=CATALOG_COLUMNS,
+    )
+    frame["price"] = pd.to_numeric(
+        frame["price"].astype("string").str.replace(r"\D", "", regex=True),
+        errors="coerce",
+    ).astype("Int64")
+    for column in TEXT_COLUMNS:
+        frame[column] = frame[column].astype("string")
+    return frame
+
+
+def frame_to_items(frame):
+    """
+    Converts a catalog DataFrame back to JSON-ready rows: prices as digit
+    strings, optional fields dropped when empty.
+    """
+    # Колонки переводим в списки целиком: поячеечный обход to_dict("records")
+    # медленнее, чем json.load исходного файла
+    columns = []
+    for column in CATALOG_COLUMNS:
+        values = frame[column]
+        if column == "price":
+            values = values.astype("string")
+        columns.append(values.astype(object).where(values.notna(), None).tolist())
+    return [
+        {
+            column: value
+            for column, value in zip(CATALOG_COLUMNS, row)
+            if value is not None or column in REQUIRED_COLUMNS
+        }
+        for row in zip(*columns)
+    ]
+
+
+def normalize_item(item):
+    """
+    Same row as frame_to_items(catalog_to_frame([item])) would give, without
+    building a DataFrame.
+    """
+    row = {}
+    for column in CATALOG_COLUMNS:
+        value = item.get(column)
+        if value is not None and column == "price":
+            digits = re.sub(r"\D", "", str(value))
+            value = str(int(digits)) if digits else None
+        elif value is not None:
+            value = str(value)
+        if value is not None or column in REQUIRED_COLUMNS:
+            row[column] = value
+    return row
+
+
+def _write_cache(frame, cache_path):
+    """
+    Writes a parquet cache if a parquet engine is installed and the
+    directory is writable; otherwise the catalog works without a cache.
+    """
+    try:
+        frame.to_parquet(cache_path, index=False)
+    except (ImportError, OSError, ValueError):
+        # Нет pyarrow/fastparquet или каталог только для чтения — работаем без кэша
+        pass
+
+
+def _cache_pays_off(path):
+    try:
+        return os.path.getsize(path) >= CACHE_MIN_BYTES
+    except OSError:
+        return False
+
+
+def load_catalog(path="podarki.json", cache_path="podarki.parquet"):
+    """
+    Loads the catalog as a typed DataFrame. For JSON files of at least
+    CACHE_MIN_BYTES a columnar cache next to the file is used when it is
+    newer than the JSON, and refreshed otherwise.
+    """
+    if not _cache_pays_off(path):
+        cache_path = None
+    if cache_path and os.path.exists(cache_path):
+        if os.path.getmtime(cache_path) >= os.path.getmtime(path):
+            try:
+                return pd.read_parquet(cache_path)
+            except (ImportError, OSError, ValueError):
+                pass
+
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            items = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        items = []
+
+    frame = catalog_to_frame(items)
+    if cache_path and items:
+        _write_cache(frame, cache_path)
+    return frame
+
+
+def load_items(path="podarki.json", cache_path="podarki.parquet"):
+    """
+    Loads the catalog as JSON-ready rows (see frame_to_items). Large files go
+    through load_catalog() and its cache; small ones are read as JSON
+    directly, which is faster than any DataFrame round trip.
+    """
+    if _cache_pays_off(path):
+        return frame_to_items(load_catalog(path, cache_path))
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            items = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return []
+    return [normalize_item(item if isinstance(item, dict) else {}) for item in items]
+
+
+def filter_catalog(frame, min_price=None, max_price=None, include_unpriced=True):
+    """Returns rows whose price lies in [min_price, max_price]."""
+    mask = pd.Series(True, index=frame.index)
+    prices = frame["price"]
+    if min_price is not None:
+        mask &= (prices >= min_price).fillna(False)
+    if max_price is not None:
+        mask &= (prices <= max_price).fillna(False)
+    if include_unpriced:
+        mask |= prices.isna()
+    return frame[mask]
+
+
+def sort_catalog(frame, sort_option):
+    """Sorts the frame by one of the SORT_OPTIONS keys; missing values go last."""
+    spec = SORT_OPTIONS.get(sort_option)
+    if spec is None:
+        return frame
+    column, ascending = spec
+    if column == "name":
+        key = lambda values: values.str.lower()
+    else:
+        key = None
+    return frame.sort_values(
+        column, ascending=ascending, na_position="last", kind="stable", key=key
+    )
+
+
+def catalog_stats(frame):
+    """
+    Summary of the catalog: item count, number of priced items, total and
+    average price, and a per-price-band breakdown (count and sum).
+    """
+    prices = frame["price"].dropna().astype("int64")
+    bands = pd.cut(prices, bins=PRICE_BANDS, labels=PRICE_BAND_LABELS, right=False)
+    breakdown = (
+        prices.groupby(bands, observed=False)
+        .agg(["count", "sum"])
+        .rename(columns={"count": "Позиций", "sum": "Сумма, ₽"})
+    )
+    breakdown.index.name = "Цена, ₽"
+    return {
+        "count": len(frame),
+        "priced": len(prices),
+        "total": int(prices.sum()),
+        "average": int(prices.mean()) if len(prices) else 0,
+        "bands": breakdown,
+    }
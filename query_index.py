@@ -0,0 +1,156 @@
+import json
+import re
+
+from search_index import stem
+
+
+# Короткие служебные слова, которые не меняют смысл запроса
+STOP_WORDS = {"в", "во", "на", "для", "и", "с", "со", "по", "из", "от", "к", "о"}
+
+
+def normalize_query(query):
+    """
+    Normalizes a search query so that variants differing only by case,
+    punctuation or word order map to the same key.
+    """
+    if not query:
+        return ""
+    text = query.lower().replace("ё", "е")
+    # Всё, что не буква и не цифра, превращаем в пробел
+    text = re.sub(r"[^\w]+|_", " ", text)
+    tokens = [t for t in text.split() if t not in STOP_WORDS]
+    # Убираем повторы и сортируем, чтобы порядок слов не влиял на ключ
+    return " ".join(sorted(set(tokens)))
+
+
+def _stems(key):
+    """Stemmed tokens of a normalized key; near-duplicates must have the same set."""
+    return frozenset(stem(token) for token in key.split())
+
+
+def _trigrams(key):
+    """Returns the set of character trigrams of a normalized key."""
+    padded = f"  {key} "
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+class QueryIndex:
+    """
+    In-memory index of already fetched queries.
+
+    Exact matches are found by the normalized key, near-duplicates by
+    trigram similarity over an inverted trigram index. A near-duplicate may
+    differ from the query only in word endings: its stemmed words must be the
+    same, so "Canon EOS 2000D" does not match "Canon EOS 1200D" and "рюкзак
+    зеленый" does not match "рюкзак черный" (stop words are already dropped
+    by normalize_query).
+    """
+
+    def __init__(self, threshold=0.8):
+        self.threshold = threshold
+        self.results = {}  # {normalized key: result}
+        self.trigrams = {}  # {normalized key: set of trigrams}
+        self.stems = {}  # {normalized key: frozenset of stemmed tokens}
+        self.postings = {}  # {trigram: set of normalized keys}
+        self.exact_hits = 0
+        self.near_hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.results)
+
+    def add(self, query, result):
+        """Stores a fetched result under the normalized form of its query."""
+        key = normalize_query(query)
+        if not key:
+            return
+        if key not in self.results:
+            grams = _trigrams(key)
+            self.trigrams[key] = grams
+            self.stems[key] = _stems(key)
+            for gram in grams:
+                self.postings.setdefault(gram, set()).add(key)
+        self.results[key] = result
+
+    def find(self, query):
+        """
+        Returns (result, similarity) for the best stored match of the query,
+        or (None, 0.0) if nothing is similar enough. Does not touch counters.
+        """
+        key = normalize_query(query)
+        if not key:
+            return None, 0.0
+        if key in self.results:
+            return self.results[key], 1.0
+
+        grams = _trigrams(key)
+        shared = {}
+        for gram in grams:
+            for candidate in self.postings.get(gram, ()):
+                shared[candidate] = shared.get(candidate, 0) + 1
+
+        stems = _stems(key)
+        best_key, best_score = None, 0.0
+        for candidate, common in shared.items():
+            if self.stems[candidate] != stems:
+                continue
+            union = len(grams) + len(self.trigrams[candidate]) - common
+            score = common / union
+            if score > best_score:
+                best_key, best_score = candidate, score
+
+        if best_key is not None and best_score >= self.threshold:
+            return self.results[best_key], best_score
+        return None, best_score
+
+    def lookup(self, query):
+        """
+        Same as find(), but returns only the result and counts the lookup
+        as an exact hit, a near-duplicate hit or a miss.
+        """
+        result, score = self.find(query)
+        if result is None:
+            self.misses += 1
+        elif score == 1.0:
+            self.exact_hits += 1
+        else:
+            self.near_hits += 1
+        return result
+
+    @property
+    def saved(self):
+        """Number of fetches avoided thanks to the index."""
+        return self.exact_hits + self.near_hits
+
+    def stats_line(self):
+        """Human-readable summary of the lookup counters."""
+        return (
+            f"Query index: {self.saved} fetches saved "
+            f"({self.exact_hits} exact, {self.near_hits} near-duplicate), "
+            f"{self.misses} new queries."
+        )
+
+
+def build_index_from_items(items, threshold=0.8):
+    """
+    Builds a QueryIndex from catalog rows. Rows are indexed by their 'query'
+    field (falling back to 'name'); rows without a URL are skipped.
+    """
+    index = QueryIndex(threshold=threshold)
+    for item in items:
+        if not isinstance(item, dict) or not item.get("purchaseUrl"):
+            continue
+        query = item.get("query") or item.get("name")
+        if query:
+            index.add(query, item)
+    return index
+
+
+def load_index(path="podarki.json", threshold=0.8):
+    """Loads catalog rows from a JSON file and builds a QueryIndex from them."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            items = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        items = []
+    return build_index_from_items(items, threshold=threshold)
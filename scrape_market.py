@@ -1,19 +1,86 @@
+import argparse
 import json
+import math
+import os
 import re
+import sys
+import threading
 import time
+import zlib
 from selenium import webdriver
 from selenium.webdriver.chrome.service import Service as ChromeService
 from webdriver_manager.chrome import ChromeDriverManager
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from bs4 import BeautifulSoup
-from urllib.parse import quote
+from bs4 import BeautifulSoup, Comment
+from urllib.parse import quote, urlparse
+
+from query_index import load_index, normalize_query
+from search_index import term_overlap
+from selector_cascade import SelectorCascade, load_cascades, save_cascades
+from single_flight import SingleFlight
+from sources import CatalogSource, Source, SourceRouter
+
+
+# Можно переопределить, например, чтобы направить парсер на локальный тестовый сервер
+MARKET_HOST = os.environ.get("MARKET_HOST", "https://market.yandex.ru")
+
+# /card/<slug>/<id>, /product--<slug>/<id>, /product/<id>
+PRODUCT_PATH_RE = re.compile(r"^/(?:card|product)(?:--[^/]+)?/(?:[^/]+/)?(\d+)(?=/|$)")
+OFFER_PATH_RE = re.compile(r"^/offer/([\w-]+)")
 
 
 def get_search_url(query):
     """Constructs a Yandex Market search URL."""
-    return f"https://market.yandex.ru/search?text={quote(query)}"
+    return f"{MARKET_HOST}/search?text={quote(query)}"
+
+
+def canonicalize_product_url(url):
+    """
+    Strips tracking parameters (cpc, do-waremd5, sponsored, ...) from a Market
+    product URL, keeping its scheme and host (relative URLs get MARKET_HOST).
+    Returns (canonical_url, product_id); product_id is None for URLs that are
+    not Market product or offer pages, which are returned as is.
+    """
+    if not url:
+        return url, None
+    parsed = urlparse(url)
+    if (
+        parsed.netloc
+        and not parsed.netloc.endswith("market.yandex.ru")
+        and parsed.netloc != urlparse(MARKET_HOST).netloc
+    ):
+        return url, None
+
+    # Хост ссылки сохраняем: MARKET_HOST может указывать на тестовый сервер,
+    # а ссылки в podarki.json ведут на настоящий Маркет
+    if parsed.netloc:
+        host = f"{parsed.scheme or 'https'}://{parsed.netloc}"
+    else:
+        host = MARKET_HOST
+    match = PRODUCT_PATH_RE.match(parsed.path)
+    if match:
+        return host + match.group(0), match.group(1)
+    match = OFFER_PATH_RE.match(parsed.path)
+    if match:
+        return host + match.group(0), f"offer-{match.group(1)}"
+    return url, None
+
+
+def compact_item(item):
+    """
+    Returns a copy of a catalog row with a canonical purchaseUrl and its
+    productId, so the same product found via different queries is recognized.
+    """
+    compacted = item.copy()
+    url, product_id = canonicalize_product_url(item.get("purchaseUrl"))
+    compacted["purchaseUrl"] = url
+    if product_id:
+        compacted["productId"] = product_id
+    else:
+        compacted.pop("productId", None)
+    return compacted
 
 
 def setup_driver():
@@ -40,9 +107,396 @@ def setup_driver():
         return None
 
 
-def scrape_yandex_market_selenium(driver, gift_name):
+# --- Selector strategies ---
+# Каждое поле ищется каскадом именованных стратегий; порядок подстраивается
+# под текущую разметку по статистике попаданий (см. selector_cascade.py)
+SELECTOR_STATS_PATH = "selector_stats.json"
+
+CARD_CASCADE = SelectorCascade("card")
+NAME_CASCADE = SelectorCascade("name")
+PRICE_CASCADE = SelectorCascade("price")
+LINK_CASCADE = SelectorCascade("link")
+RATING_CASCADE = SelectorCascade("rating")
+REVIEWS_CASCADE = SelectorCascade("reviews")
+PRODUCT_PRICE_CASCADE = SelectorCascade("product_price")
+ALL_CASCADES = [
+    CARD_CASCADE,
+    NAME_CASCADE,
+    PRICE_CASCADE,
+    LINK_CASCADE,
+    RATING_CASCADE,
+    REVIEWS_CASCADE,
+    PRODUCT_PRICE_CASCADE,
+]
+
+
+def load_selector_stats(path=SELECTOR_STATS_PATH):
+    """Restores the learned selector order from a previous run."""
+    load_cascades(ALL_CASCADES, path)
+
+
+def save_selector_stats(path=SELECTOR_STATS_PATH):
+    """Persists the learned selector order for the next run."""
+    save_cascades(ALL_CASCADES, path)
+
+
+def _class_contains(*parts):
+    """Class matcher for BeautifulSoup: any of the parts in the class string."""
+    return lambda x: x and any(part in x for part in parts)
+
+
+def _clean_title(text):
+    """Strips trailing commas, dots, dashes and spaces from a title."""
+    return re.sub(r"[,\.\-\s]+$", "", text) or None
+
+
+# Стратегии карточек возвращают все карточки страницы (или None)
+@CARD_CASCADE.strategy("searchOrganic")
+def _card_search_organic(soup):
+    return soup.find_all("article", {"data-auto": "searchOrganic"}) or None
+
+
+@CARD_CASCADE.strategy("zone-item")
+def _card_zone_item(soup):
+    return soup.find_all("div", {"data-zone-name": "item"}) or None
+
+
+@CARD_CASCADE.strategy("snippet-card-class")
+def _card_snippet_class(soup):
+    return soup.find_all("div", {"class": _class_contains("snippet-card")}) or None
+
+
+@CARD_CASCADE.strategy("any-card-class")
+def _card_any_class(soup):
+    # Любые блоки с card/product/item в классе
+    return soup.find_all("div", {"class": _class_contains("card", "product", "item")}) or None
+
+
+@NAME_CASCADE.strategy("zone-title")
+def _name_zone_title(card, gift_name):
+    # Элемент с data-zone-name="title" - основной источник названия товара
+    title_element = card.find(attrs={"data-zone-name": "title"})
+    return _clean_title(title_element.get_text(strip=True)) if title_element else None
+
+
+@NAME_CASCADE.strategy("snippet-title")
+def _name_snippet_title(card, gift_name):
+    name_tag = card.find("h3", {"data-auto": "snippet-title"})
+    if not name_tag:
+        return None
+    return name_tag.get_text(strip=True) or None
+
+
+@NAME_CASCADE.strategy("title-class")
+def _name_title_class(card, gift_name):
+    name_tag = card.find(
+        ["h1", "h2", "h3", "h4", "h5", "span", "div"],
+        {"class": _class_contains("title", "name", "product")},
+    )
+    if not name_tag:
+        return None
+    return name_tag.get_text(strip=True) or None
+
+
+# Длиннее этого строка - описание или данные виджета, а не название
+MAX_NAME_LENGTH = 200
+
+
+@NAME_CASCADE.strategy("any-text")
+def _name_any_text(card, gift_name):
+    # Последняя попытка - первая видимая строка, похожая на название;
+    # текст скриптов и стилей карточки не берём
+    for text in _visible_strings(card):
+        if (
+            5 < len(text) <= MAX_NAME_LENGTH
+            and not text.startswith("http")
+            and text != gift_name
+            and re.search(r"[^\W\d_]{3}", text)
+        ):
+            return text
+    return None
+
+
+@PRICE_CASCADE.strategy("span-price-value")
+def _price_span_value(card):
+    return card.find("span", {"data-auto": "price-value"})
+
+
+@PRICE_CASCADE.strategy("div-price-value")
+def _price_div_value(card):
+    return card.find("div", {"data-auto": "price-value"})
+
+
+@PRICE_CASCADE.strategy("span-price-class")
+def _price_span_class(card):
+    return card.find("span", {"class": _class_contains("price")})
+
+
+@PRICE_CASCADE.strategy("div-price-class")
+def _price_div_class(card):
+    return card.find("div", {"class": _class_contains("price")})
+
+
+@PRICE_CASCADE.strategy("digits-in-price-class")
+def _price_any_digits(card):
+    for element in card.find_all(
+        ["span", "div"], {"class": _class_contains("price", "cost", "value")}
+    ):
+        if re.search(r"\d", element.get_text(strip=True)):
+            return element
+    return None
+
+
+@LINK_CASCADE.strategy("title-link")
+def _link_title(card):
+    return card.find("a", {"data-zone-name": "title"}, href=True)
+
+
+@LINK_CASCADE.strategy("product-href")
+def _link_product_href(card):
+    return card.find("a", href=re.compile(r"/product/"))
+
+
+@LINK_CASCADE.strategy("link-class")
+def _link_class(card):
+    return card.find("a", {"class": _class_contains("link")}, href=True)
+
+
+@LINK_CASCADE.strategy("data-uid")
+def _link_data_uid(card):
+    return card.find("a", {"data-uid": True}, href=True)
+
+
+@LINK_CASCADE.strategy("any-link")
+def _link_any(card):
+    return card.find("a", href=True)
+
+
+def _as_rating(text):
+    """A rating on the 1..5 scale from text like '4,8', or None."""
+    match = re.search(r"\d+(?:[.,]\d+)?", text or "")
+    if not match:
+        return None
+    value = float(match.group(0).replace(",", "."))
+    return value if 1 <= value <= 5 else None
+
+
+def _as_count(text):
+    """A count from text like '(1 234)' or '1 234 отзыва', or None."""
+    match = re.search(r"\d[\d\s\u00a0\u202f]*", text or "")
+    if not match:
+        return None
+    return int(re.sub(r"\D", "", match.group(0)))
+
+
+def _visible_strings(card):
+    """Text nodes of a card, without comments, embedded scripts and widget JSON."""
+    return [
+        text.strip()
+        for text in card.find_all(string=True)
+        if text.strip()
+        and not isinstance(text, Comment)
+        and text.parent.name not in ("script", "style", "noframes")
+    ]
+
+
+RATING_LABEL_RE = re.compile(r"рейтинг|оценка", re.I)
+
+
+def _card_markers(card):
     """
-    Searches for a gift on Yandex Market using Selenium and returns the name, price, URL, and image URL of the first result.
+    First elements of a card that mark its rating and reviews, collected in
+    one pass: {"aria-label": ..., "rating": ..., "review": ...}.
+    """
+    markers = {}
+    for element in card.find_all(True):
+        attrs = element.attrs
+        label = attrs.get("aria-label")
+        if label and "aria-label" not in markers and RATING_LABEL_RE.search(label):
+            markers["aria-label"] = element
+        marker = f"{attrs.get('data-auto', '')} {attrs.get('data-zone-name', '')}".lower()
+        if "rating" in marker:
+            markers.setdefault("rating", element)
+        if "review" in marker:
+            markers.setdefault("review", element)
+    return markers
+
+
+@RATING_CASCADE.strategy("aria-label")
+def _rating_aria_label(card, markers):
+    # <span aria-label="Рейтинг 4,8 из 5">
+    element = markers.get("aria-label")
+    return _as_rating(element["aria-label"]) if element else None
+
+
+@RATING_CASCADE.strategy("rating-marker")
+def _rating_marker(card, markers):
+    element = markers.get("rating")
+    return _as_rating(element.get_text(" ", strip=True)) if element else None
+
+
+@REVIEWS_CASCADE.strategy("reviews-marker")
+def _reviews_marker(card, markers):
+    element = markers.get("review")
+    return _as_count(element.get_text(" ", strip=True)) if element else None
+
+
+@REVIEWS_CASCADE.strategy("count-after-rating")
+def _reviews_after_rating(card, markers):
+    # Маркет часто пишет рядом с рейтингом "4,8 (1 234)"
+    element = markers.get("rating")
+    if not element:
+        return None
+    match = re.search(r"\(([\d\s\u00a0\u202f]+)\)", element.get_text(" ", strip=True))
+    return _as_count(match.group(1)) if match else None
+
+
+@REVIEWS_CASCADE.strategy("reviews-text")
+def _reviews_text(card, markers):
+    # "1 234 отзыва", "56 оценок"
+    for text in _visible_strings(card):
+        match = re.search(r"(\d[\d\s\u00a0\u202f]*)\s*(?:отзыв|оцен)", text, re.I)
+        if match:
+            return _as_count(match.group(1))
+    return None
+
+
+@PRODUCT_PRICE_CASCADE.strategy("span-price-value")
+def _product_price_span_value(soup):
+    return soup.find("span", {"data-auto": "price-value"})
+
+
+@PRODUCT_PRICE_CASCADE.strategy("div-price-value")
+def _product_price_div_value(soup):
+    return soup.find("div", {"data-auto": "price-value"})
+
+
+@PRODUCT_PRICE_CASCADE.strategy("span-price-class")
+def _product_price_span_class(soup):
+    return soup.find("span", {"class": _class_contains("price")})
+
+
+# --- Ranking of search results ---
+# Вклад признаков в оценку карточки; реклама оценку снижает
+RANKING_WEIGHTS = {
+    "title": 0.4,
+    "rating": 0.25,
+    "reviews": 0.2,
+    "price": 0.15,
+    "sponsored": -0.1,
+}
+# Сколько отзывов считаем "много": больше не добавляет к оценке
+REVIEWS_SATURATION = 1000
+# Карточек на странице, которые оцениваем
+MAX_RANKED_CARDS = 30
+
+
+def extract_candidate(card, gift_name):
+    """
+    Reads one search result card into a candidate dict with name, price,
+    purchaseUrl, imageUrl, rating, reviews and sponsored. Missing fields
+    are None.
+    """
+    name, _ = NAME_CASCADE.run(card, gift_name)
+
+    price = None
+    price_tag, _ = PRICE_CASCADE.run(card)
+    if price_tag:
+        # Remove all non-digit characters to get a clean price number
+        price = re.sub(r"\D", "", price_tag.get_text(strip=True)) or None
+
+    purchase_url = None
+    link_tag, _ = LINK_CASCADE.run(card)
+    if link_tag:
+        url = link_tag["href"]
+        purchase_url = MARKET_HOST + url if url.startswith("/") else url
+        purchase_url, _ = canonicalize_product_url(purchase_url)
+
+    image_url = None
+    img_tag = card.find("img", src=True)
+    if img_tag:
+        image_url = img_tag["src"]
+        # Ensure the URL is absolute
+        if image_url.startswith("//"):
+            image_url = "https:" + image_url
+
+    markers = _card_markers(card)
+    rating, _ = RATING_CASCADE.run(card, markers)
+    # Число отзывов Маркет показывает только рядом с рейтингом
+    reviews = REVIEWS_CASCADE.run(card, markers)[0] if rating else None
+    # Рекламные карточки помечены sponsored=1 в ссылках или подписью "Реклама"
+    sponsored = any(
+        "sponsored=1" in a["href"] for a in card.find_all("a", href=True)
+    ) or bool(card.find(attrs={"data-auto": "banner-ad-label"}))
+
+    return {
+        "name": name,
+        "price": price,
+        "purchaseUrl": purchase_url,
+        "imageUrl": image_url,
+        "rating": rating,
+        "reviews": reviews,
+        "sponsored": sponsored,
+    }
+
+
+def _price_fit(price, price_range, reference):
+    """
+    1.0 for a price inside price_range (min, max; either may be None),
+    decaying with the distance outside it. Without a range only outliers
+    are penalized: prices under half or over twice the reference (median of
+    the page), such as accessories and bundles, score lower.
+    """
+    if not price:
+        return 0.0
+    price = int(price)
+    if price_range:
+        low, high = price_range
+        if low and price < low:
+            return price / low
+        if high and price > high:
+            return high / price
+        return 1.0
+    if not reference or price <= 0:
+        return 1.0
+    return min(1.0, 2 * math.exp(-abs(math.log(price / reference))))
+
+
+def score_candidate(candidate, query, price_range=None, reference_price=None):
+    """Score of a candidate card for the query; higher is better."""
+    weights = RANKING_WEIGHTS
+    rating = candidate.get("rating")
+    reviews = candidate.get("reviews") or 0
+    parts = {
+        "title": term_overlap(query, candidate.get("name") or ""),
+        # Без рейтинга - нейтральное значение, а не ноль
+        "rating": rating / 5 if rating else 0.5,
+        "reviews": min(1.0, math.log1p(reviews) / math.log1p(REVIEWS_SATURATION)),
+        "price": _price_fit(candidate.get("price"), price_range, reference_price),
+        "sponsored": 1.0 if candidate.get("sponsored") else 0.0,
+    }
+    return round(sum(weights[key] * value for key, value in parts.items()), 4)
+
+
+def rank_candidates(candidates, query, price_range=None):
+    """
+    Scores candidates in place ("score" key) and returns them best first;
+    equal scores keep page order.
+    """
+    prices = sorted(int(c["price"]) for c in candidates if c.get("price"))
+    reference = prices[len(prices) // 2] if prices else None
+    for candidate in candidates:
+        candidate["score"] = score_candidate(candidate, query, price_range, reference)
+    return sorted(candidates, key=lambda c: -c["score"])
+
+
+def find_best_match(driver, gift_name, price_range=None):
+    """
+    Loads the search page for a gift, scores every result card by title
+    similarity, rating, review count, price fit and sponsorship, and returns
+    the best candidate (see extract_candidate) with its "score", or None.
+    Only cards with a price and a link are ranked; if there are none, all
+    cards are, as before.
     """
     search_url = get_search_url(gift_name)
 
@@ -61,193 +515,49 @@ def scrape_yandex_market_selenium(driver, gift_name):
         print("Page HTML saved to debug_page.html for inspection.")
     except Exception as e:
         print(f"Error loading page or finding element for '{gift_name}': {e}")
-        return None, None, None, None
+        return None
 
     soup = BeautifulSoup(driver.page_source, "html.parser")
 
     print(f"Looking for product cards for '{gift_name}'...")
+    product_cards, strategy = CARD_CASCADE.run(soup)
+    if not product_cards:
+        print(f"Could not find any product card for '{gift_name}'")
+        return None
+    print(f"Found {len(product_cards)} product cards via '{strategy}' for '{gift_name}'")
 
-    # Попробуем разные возможные селекторы для поиска карточек товаров
-    product_card = soup.find("article", {"data-auto": "searchOrganic"})
-    if not product_card:
-        print(
-            f"Could not find product card with 'data-auto=searchOrganic' for '{gift_name}'"
-        )
-        # Попробуем другой селектор
-        product_card = soup.find("div", {"data-zone-name": "item"})
-        if not product_card:
-            print(
-                f"Could not find product card with 'data-zone-name=item' for '{gift_name}'"
-            )
-            # Попробуем ещё один селектор
-            product_card = soup.find(
-                "div", {"class": lambda x: x and "snippet-card" in x}
-            )
-            if not product_card:
-                print(
-                    f"Could not find product card with class containing 'snippet-card' for '{gift_name}'"
-                )
-                # Попробуем найти все карточки товаров
-                all_cards = soup.find_all(
-                    "div",
-                    {
-                        "class": lambda x: x
-                        and ("card" in x or "product" in x or "item" in x)
-                    },
-                )
-                print(f"Found {len(all_cards)} potential product cards")
-                if all_cards:
-                    product_card = all_cards[0]  # Берём первую карточку
-                    print(f"Using first card as product card for '{gift_name}'")
-                else:
-                    print(f"Could not find any product card for '{gift_name}'")
-                    return None, None, None, None
-            else:
-                print(
-                    f"Found product card with class containing 'snippet-card' for '{gift_name}'"
-                )
-        else:
-            print(f"Found product card with 'data-zone-name=item' for '{gift_name}'")
-    else:
-        print(f"Found product card with 'data-auto=searchOrganic' for '{gift_name}'")
-
-    # Extract the product name
-    name = gift_name  # Начинаем с поискового запроса на случай, если не найдем реальное имя
-
-    # Ищем элемент с data-zone-name="title" - это основной источник названия товара
-    title_element = product_card.find(attrs={"data-zone-name": "title"})
-    if title_element:
-        name = title_element.get_text(strip=True)
-        # Убираем лишние символы вроде запятых и т.п. в конце
-        name = re.sub(r"[,\.\-\s]+$", "", name)
-    else:
-        # Если не найден элемент с data-zone-name="title", пробуем другие селекторы
-        # Попробуем разные селекторы для поиска названия
-        name_tag = product_card.find("h3", {"data-auto": "snippet-title"})
-        if not name_tag:
-            # Ищем заголовок внутри ссылки с data-zone-name=title
-            title_zone = product_card.find("a", {"data-zone-name": "title"})
-            if title_zone:
-                # Проверяем внутри этой ссылки наличие заголовков
-                name_tag = title_zone.find(["h3", "h4", "h5", "span", "div"])
-                if not name_tag:
-                    # Если нет заголовков, используем текст самой ссылки
-                    name = title_zone.get_text(strip=True)
-            if not name_tag and not name:
-                # Ищем тег с классом, содержащим 'title' или 'name'
-                name_tag = product_card.find(
-                    ["h1", "h2", "h3", "h4", "h5", "span", "div"],
-                    {
-                        "class": lambda x: x
-                        and ("title" in x or "name" in x or "product" in x)
-                    },
-                )
-        if not name_tag and not name:
-            # Ищем внутри всей карточки тег с текстом, который может быть названием
-            name_tag = product_card.find(
-                ["span", "div"], {"class": lambda x: x and "link" in x and "title" in x}
-            )
-        if not name_tag and not name:
-            # Последняя попытка - любой тег с осмысленным текстом
-            all_text_elements = product_card.find_all(
-                ["span", "div", "a", "h1", "h2", "h3", "h4", "h5"]
-            )
-            for element in all_text_elements:
-                element_text = element.get_text(strip=True)
-                if (
-                    element_text
-                    and len(element_text) > 5
-                    and not element_text.startswith("https")
-                    and element_text != gift_name
-                ):
-                    name = element_text
-                    break
-
-        # Если нашли name_tag, извлекаем текст из него
-        if name_tag:
-            name = name_tag.get_text(strip=True)
-
-    print(f"Found name: '{name}' for '{gift_name}'")
-
-    price = None
-    # Prices can be in different tags, let's try a few selectors
-    price_tag = product_card.find("span", {"data-auto": "price-value"})
-    if not price_tag:
-        price_tag = product_card.find("div", {"data-auto": "price-value"})
-    if not price_tag:
-        # Попробуем найти цену с помощью класса
-        price_tag = product_card.find("span", {"class": lambda x: x and "price" in x})
-    if not price_tag:
-        price_tag = product_card.find("div", {"class": lambda x: x and "price" in x})
-    if not price_tag:
-        # Попробуем найти цену в дочерних элементах
-        all_price_elements = product_card.find_all(
-            ["span", "div"],
-            {"class": lambda x: x and ("price" in x or "cost" in x or "value" in x)},
-        )
-        for element in all_price_elements:
-            element_text = element.get_text(strip=True)
-            if re.search(r"\d", element_text):  # Проверяем, есть ли цифры в тексте
-                price_tag = element
-                break
-    if not price_tag:
-        print(f"Could not find price tag for '{gift_name}'")
-    else:
-        price_text = price_tag.get_text(strip=True)
-        # Remove all non-digit characters to get a clean price number
-        price = re.sub(r"\D", "", price_text)
-        print(f"Found price: '{price}' for '{gift_name}'")
-
-    purchase_url = None
-    link_tag = product_card.find("a", {"data-zone-name": "title"}, href=True)
-    if not link_tag:
-        # Fallback to the link that contains the title
-        link_tag = product_card.find("a", href=re.compile(r"/product/"))
-        if not link_tag:
-            # Попробуем найти ссылку с классом, содержащим 'link'
-            link_tag = product_card.find(
-                "a", {"class": lambda x: x and "link" in x}, href=True
-            )
-            if not link_tag:
-                # Попробуем найти ссылку с data-uid
-                link_tag = product_card.find("a", {"data-uid": True}, href=True)
-                if not link_tag:
-                    # Попробуем найти любую ссылку внутри карточки
-                    link_tag = product_card.find("a", href=True)
-                    if not link_tag:
-                        print(f"Could not find URL for '{gift_name}'")
-                    else:
-                        print(f"Found fallback URL link for '{gift_name}'")
-                else:
-                    print(f"Found URL link with 'data-uid' for '{gift_name}'")
-            else:
-                print(f"Found URL link with 'link' in class for '{gift_name}'")
-        else:
-            print(f"Found URL link with '/product/' in href for '{gift_name}'")
-    else:
-        print(f"Found title URL link for '{gift_name}'")
-
-    if link_tag:
-        url = link_tag["href"]
-        if url.startswith("/"):
-            purchase_url = "https://market.yandex.ru" + url
-        else:
-            purchase_url = url
-        print(f"Final URL: '{purchase_url}' for '{gift_name}'")
+    candidates = [
+        extract_candidate(card, gift_name) for card in product_cards[:MAX_RANKED_CARDS]
+    ]
+    # Карточка без цены или ссылки не годится в ответ, как бы ни совпало название
+    complete = [
+        candidate
+        for candidate in candidates
+        if candidate["price"] and candidate["purchaseUrl"]
+    ]
+    if not complete:
+        print(f"No card with a price and a link for '{gift_name}', ranking all cards")
+    best = rank_candidates(complete or candidates, gift_name, price_range)[0]
+    if not best["name"]:
+        best["name"] = gift_name
+        print(f"Could not find name, using query '{gift_name}'")
+    print(
+        f"Best match for '{gift_name}' (score {best['score']}): '{best['name']}', "
+        f"price {best['price']}, rating {best['rating']}, reviews {best['reviews']}, "
+        f"sponsored {best['sponsored']}"
+    )
+    return best
 
-    image_url = None
-    # Find the image tag
-    img_tag = product_card.find("img", src=True)
-    if img_tag:
-        image_url = img_tag["src"]
-        # Ensure the URL is absolute
-        if image_url.startswith("//"):
-            image_url = "https:" + image_url
-        print(f"Found image URL: '{image_url}' for '{gift_name}'")
-    else:
-        print(f"Could not find image for '{gift_name}'")
 
-    return name, price, purchase_url, image_url
+def scrape_yandex_market_selenium(driver, gift_name):
+    """
+    Searches for a gift on Yandex Market using Selenium and returns the name,
+    price, URL, and image URL of the best ranked result (see find_best_match).
+    """
+    best = find_best_match(driver, gift_name)
+    if not best:
+        return None, None, None, None
+    return best["name"], best["price"], best["purchaseUrl"], best["imageUrl"]
 
 
 def scrape_yandex_market_alternatives(driver, query, num_results=5):
@@ -282,8 +592,11 @@ def scrape_yandex_market_alternatives(driver, query, num_results=5):
 
     print(f"Found {len(product_cards)} product cards for '{query}'.")
 
-    for card in product_cards[:num_results]:
-        name, price, purchase_url, image_url = None, None, None, None
+    seen_products = set()
+    for card in product_cards:
+        if len(results) >= num_results:
+            break
+        name, price, purchase_url, image_url, product_id = None, None, None, None, None
 
         # Extract product name
         title_element = card.find(attrs={"data-zone-name": "title"})
@@ -306,12 +619,18 @@ def scrape_yandex_market_alternatives(driver, query, num_results=5):
         if link_tag and link_tag.has_attr("href"):
             url = link_tag["href"]
             if url.startswith("/"):
-                purchase_url = "https://market.yandex.ru" + url
+                purchase_url = MARKET_HOST + url
             else:
                 purchase_url = url
+            purchase_url, product_id = canonicalize_product_url(purchase_url)
         else:
             purchase_url = None
 
+        # Один и тот же товар от разных продавцов показываем один раз
+        if product_id and product_id in seen_products:
+            print(f"  -> Skipped duplicate product {product_id}")
+            continue
+
         # Extract image URL
         img_tag = card.find("img", src=True)
         if img_tag and img_tag.has_attr("src"):
@@ -324,15 +643,17 @@ def scrape_yandex_market_alternatives(driver, query, num_results=5):
         # If at least a name is present, keep the card as an alternative.
         # It's acceptable for price or URL to be missing; we'll still show the item.
         if name:
-            results.append(
-                {
-                    "name": name,
-                    "price": price,
-                    "purchaseUrl": purchase_url,
-                    "imageUrl": image_url,
-                    "query": query,
-                }
-            )
+            alternative = {
+                "name": name,
+                "price": price,
+                "purchaseUrl": purchase_url,
+                "imageUrl": image_url,
+                "query": query,
+            }
+            if product_id:
+                alternative["productId"] = product_id
+                seen_products.add(product_id)
+            results.append(alternative)
             print(
                 f"  -> Appended alternative: name='{name}', price='{price}', url='{purchase_url[:80] if purchase_url else 'None'}'"
             )
@@ -364,12 +685,7 @@ def scrape_price_from_product_page(driver, product_url):
     soup = BeautifulSoup(driver.page_source, "html.parser")
 
     # Try typical selectors for price on product page
-    price_tag = soup.find("span", {"data-auto": "price-value"})
-    if not price_tag:
-        price_tag = soup.find("div", {"data-auto": "price-value"})
-    if not price_tag:
-        # try common classes
-        price_tag = soup.find("span", {"class": lambda x: x and "price" in x})
+    price_tag, _ = PRODUCT_PRICE_CASCADE.run(soup)
 
     if price_tag:
         price_text = price_tag.get_text(strip=True)
@@ -390,45 +706,129 @@ def scrape_price_from_product_page(driver, product_url):
     return None
 
 
-def main():
+# Общий на процесс: одинаковые одновременные запросы из разных сессий
+# приложения ждут одну загрузку страницы
+SCRAPE_FLIGHTS = SingleFlight()
+
+
+def coalesced_alternatives(driver, query, num_results=5):
     """
-    Main function to read gifts, scrape Yandex Market, and save to JSON.
+    scrape_yandex_market_alternatives() behind SCRAPE_FLIGHTS: concurrent
+    calls for the same normalized query share one page load. Each caller
+    gets its own rows, marked with its own query.
     """
-    try:
-        with open("unique_gifts.txt", "r", encoding="utf-8") as f:
-            gift_names = [line.strip() for line in f if line.strip()]
-    except FileNotFoundError:
-        print("Error: unique_gifts.txt not found.")
-        return
+    key = ("alternatives", normalize_query(query) or query, num_results)
+    alternatives = SCRAPE_FLIGHTS.do(
+        key, scrape_yandex_market_alternatives, driver, query, num_results
+    )
+    for alternative in alternatives:
+        alternative["query"] = query
+    return alternatives
 
-    print("Setting up browser driver...")
-    driver = setup_driver()
-    if not driver:
-        return
 
-    print("Driver setup complete.")
+def coalesced_product_price(driver, product_url):
+    """
+    scrape_price_from_product_page() behind SCRAPE_FLIGHTS: concurrent calls
+    for the same product (by canonical ID) share one page load.
+    """
+    canonical_url, product_id = canonicalize_product_url(product_url)
+    key = ("price", product_id or canonical_url)
+    return SCRAPE_FLIGHTS.do(key, scrape_price_from_product_page, driver, product_url)
+
+
+class MarketSource(Source):
+    """Yandex Market search through a Selenium driver, as a SourceRouter source."""
+
+    name = "market"
 
-    # Тестовый запуск: обрабатываем только последние 5 товаров для отладки
-    gift_names = gift_names[-5:]
+    def __init__(self, driver, price_range=None):
+        self.driver = driver
+        self.price_range = price_range
+        # Один браузер не может открывать две страницы одновременно
+        self.lock = threading.Lock()
 
+    def lookup(self, query):
+        with self.lock:
+            best = find_best_match(self.driver, query, self.price_range)
+        if not best or not (best["price"] and best["purchaseUrl"]):
+            return None
+        return compact_item(
+            {
+                "name": best["name"],
+                "price": best["price"],
+                "purchaseUrl": best["purchaseUrl"],
+                "imageUrl": best["imageUrl"],
+                "query": query,
+            }
+        )
+
+
+def build_router(driver, catalogs=(), hedge_after=5.0):
+    """
+    SourceRouter over Market and local catalog files (e.g. new_emotions.json).
+    Catalog files that do not exist are skipped. Learned affinity is loaded.
+    """
+    sources = [MarketSource(driver)]
+    for path in catalogs:
+        source = CatalogSource.from_file(path)
+        if len(source):
+            sources.append(source)
+    router = SourceRouter(sources, hedge_after=hedge_after)
+    router.load()
+    return router
+
+
+def scrape_batch(driver, gift_names, query_index, delay=1, router=None):
+    """
+    Scrapes a list of gift names with one driver, in order. With a
+    SourceRouter, each name is looked up through its sources instead of
+    Market alone. Returns (scraped rows, number of duplicate products skipped).
+    """
     scraped_data = []
-    image_id_counter = 1
+    # Товары, уже попавшие в результат, по каноническому ID
+    seen_products = set()
+    duplicate_products = 0
+    market = MarketSource(driver)
 
     for gift_name in gift_names:
-        print(f"Scraping '{gift_name}'...")
-        name, price, url, image_url = scrape_yandex_market_selenium(driver, gift_name)
-
-        if price and url:
-            scraped_data.append(
+        cached = query_index.lookup(gift_name)
+        if cached:
+            item = compact_item(
                 {
-                    "name": name,
-                    "price": price,
-                    "purchaseUrl": url,
-                    "imageUrl": image_url,
+                    "name": cached.get("name"),
+                    "price": cached.get("price"),
+                    "purchaseUrl": cached.get("purchaseUrl"),
+                    "imageUrl": cached.get("imageUrl"),
+                    "query": gift_name,
                 }
             )
+            print(f"  -> Reused result for '{gift_name}': {cached.get('name')}")
+        else:
+            print(f"Scraping '{gift_name}'...")
+            if router is not None:
+                item, source_name = router.lookup(gift_name)
+                if item:
+                    print(f"  -> Answered by '{source_name}'")
+            else:
+                item = market.lookup(gift_name)
+            if item:
+                query_index.add(gift_name, item)
+            # A small delay between requests to be polite
+            time.sleep(delay)
+
+        product_id = item.get("productId") if item else None
+        if product_id and product_id in seen_products:
+            duplicate_products += 1
+            print(f"  -> Product {product_id} is already in the results, skipping.")
+            continue
+        if product_id:
+            seen_products.add(product_id)
+
+        if item:
+            scraped_data.append(item)
             print(
-                f"  -> Found name: {name}, price: {price}, URL: {url}, Image: {image_url}"
+                f"  -> Found name: {item['name']}, price: {item['price']}, "
+                f"URL: {item['purchaseUrl']}, Image: {item['imageUrl']}"
             )
         else:
             scraped_data.append(
@@ -437,20 +837,204 @@ def main():
                     "price": None,
                     "purchaseUrl": None,
                     "imageUrl": None,
+                    "query": gift_name,
                 }
             )
             print("  -> Could not find name, price, URL or image.")
 
-        image_id_counter += 1
-        # A small delay between requests to be polite
-        time.sleep(1)
+    return scraped_data, duplicate_products
+
+
+def parse_shard(spec):
+    """
+    Parses a shard spec "i/N" (1 <= i <= N) into (i, N).
+    Raises argparse.ArgumentTypeError on malformed specs.
+    """
+    match = re.fullmatch(r"\s*(\d+)\s*/\s*(\d+)\s*", spec or "")
+    if not match:
+        raise argparse.ArgumentTypeError(f"shard must look like i/N, got '{spec}'")
+    index, count = int(match.group(1)), int(match.group(2))
+    if not 1 <= index <= count:
+        raise argparse.ArgumentTypeError(f"shard index must be between 1 and {count}")
+    return index, count
+
+
+def shard_of(query, count):
+    """
+    Stable shard number (1..count) of a query. Depends only on the query text,
+    so every host assigns it the same way; variants of one query that differ
+    by case or word order land in the same shard and share its query index.
+    """
+    key = normalize_query(query) or query
+    return zlib.crc32(key.encode("utf-8")) % count + 1
+
+
+def select_shard(gift_names, index, count):
+    """The gift names assigned to shard index of count, in input order."""
+    return [name for name in gift_names if shard_of(name, count) == index]
+
+
+def read_gift_names(path):
+    """Reads non-empty lines of a gift list."""
+    with open(path, "r", encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def merge_results(result_paths, gift_names):
+    """
+    Combines shard outputs into one list in the order of gift_names.
+    Rows of the same product are kept once, at the earliest query; rows whose
+    query is not in the input go last. Returns (rows, duplicates skipped).
+    """
+    positions = {}
+    for position, name in enumerate(gift_names):
+        positions.setdefault(name, position)
+
+    rows = []
+    for path in result_paths:
+        with open(path, "r", encoding="utf-8") as f:
+            rows.extend(json.load(f))
+    # sorted() стабилен: при равной позиции сохраняется порядок файлов
+    rows.sort(key=lambda row: positions.get(row.get("query") or row.get("name"), len(positions)))
+
+    merged = []
+    seen_products = set()
+    duplicates = 0
+    for row in rows:
+        product_id = row.get("productId")
+        if product_id and product_id in seen_products:
+            duplicates += 1
+            continue
+        if product_id:
+            seen_products.add(product_id)
+        merged.append(row)
+    return merged, duplicates
+
+
+def run_scrape(args):
+    """Scrapes the gift list (or one shard of it) and saves the results."""
+    try:
+        gift_names = read_gift_names(args.input)
+    except FileNotFoundError:
+        print(f"Error: {args.input} not found.")
+        return
+
+    if args.shard:
+        index, count = args.shard
+        total = len(gift_names)
+        gift_names = select_shard(gift_names, index, count)
+        print(f"Shard {index}/{count}: {len(gift_names)} of {total} gifts.")
+    if args.limit:
+        gift_names = gift_names[: args.limit]
+
+    print("Setting up browser driver...")
+    driver = setup_driver()
+    if not driver:
+        return
+    load_selector_stats()
+
+    print("Driver setup complete.")
+
+    # Уже найденные товары из podarki.json: повторные и почти повторные
+    # запросы берём из индекса, не открывая браузер
+    query_index = load_index(args.index)
+    print(f"Query index loaded with {len(query_index)} known queries.")
+
+    router = None
+    if args.catalog:
+        router = build_router(driver, args.catalog, hedge_after=args.hedge_after)
+
+    scraped_data, duplicate_products = scrape_batch(
+        driver, gift_names, query_index, delay=args.delay, router=router
+    )
 
     driver.quit()
+    save_selector_stats()
+    if router is not None:
+        router.save()
 
-    with open("scraped_gifts_selenium.json", "w", encoding="utf-8") as f:
+    with open(args.output, "w", encoding="utf-8") as f:
         json.dump(scraped_data, f, ensure_ascii=False, indent=4)
 
-    print("\nScraping complete. Results saved to scraped_gifts_selenium.json")
+    print(f"\nScraping complete. Results saved to {args.output}")
+    print(query_index.stats_line())
+    print(f"Duplicate products skipped: {duplicate_products}")
+    if router is not None:
+        print(router.stats_line())
+
+
+def run_merge(args):
+    """Merges shard outputs into one catalog in input order."""
+    try:
+        gift_names = read_gift_names(args.input)
+    except FileNotFoundError:
+        print(f"Error: {args.input} not found.")
+        return
+
+    merged, duplicates = merge_results(args.results, gift_names)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(merged, f, ensure_ascii=False, indent=4)
+
+    print(f"Merged {len(args.results)} files into {args.output}: {len(merged)} rows.")
+    print(f"Duplicate products skipped: {duplicates}")
+
+
+COMMANDS = ("scrape", "merge")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Batch scraping of gifts from Yandex Market")
+    commands = parser.add_subparsers(dest="command")
+
+    scrape = commands.add_parser("scrape", help="scrape a gift list or one shard of it")
+    scrape.add_argument("--input", default="unique_gifts.txt", help="gift list, one per line")
+    scrape.add_argument("--output", default="scraped_gifts_selenium.json")
+    scrape.add_argument(
+        "--shard",
+        type=parse_shard,
+        help="process only shard i of N (e.g. 2/4); queries are assigned by a stable hash",
+    )
+    scrape.add_argument("--limit", type=int, help="process only the first LIMIT gifts")
+    scrape.add_argument("--index", default="podarki.json", help="catalog to reuse known results from")
+    scrape.add_argument("--delay", type=float, default=1, help="pause between requests, seconds")
+    scrape.add_argument(
+        "--catalog",
+        action="append",
+        default=[],
+        help="local JSON catalog to search besides Market (e.g. new_emotions.json); repeatable",
+    )
+    scrape.add_argument(
+        "--hedge-after",
+        type=float,
+        default=5.0,
+        help="seconds to wait for a source before also asking the next one (0 = ask all at once)",
+    )
+    scrape.set_defaults(func=run_scrape)
+
+    merge = commands.add_parser("merge", help="merge shard outputs into one catalog")
+    merge.add_argument("results", nargs="+", help="shard output files")
+    merge.add_argument("--input", default="unique_gifts.txt", help="gift list that defines the order")
+    merge.add_argument("--output", default="scraped_gifts_selenium.json")
+    merge.set_defaults(func=run_merge)
+    return parser
+
+
+def main(argv=None):
+    """
+    Command line entry point:
+
+        python scrape_market.py scrape --input unique_gifts.txt --shard 1/4 --output part1.json
+        python scrape_market.py merge part1.json part2.json ... --output merged.json
+
+    Without a command the arguments are those of scrape, e.g.
+    "python scrape_market.py --limit 5"; with none at all the whole input
+    is scraped with the default paths.
+    """
+    argv = list(sys.argv[1:] if argv is None else argv)
+    if not argv or argv[0] not in COMMANDS + ("-h", "--help"):
+        argv = ["scrape", *argv]
+    args = build_parser().parse_args(argv)
+    args.func(args)
 
 
 if __name__ == "__main__":
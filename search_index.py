@@ -0,0 +1,119 @@
+import bisect
+import re
+from functools import lru_cache
+
+
+# Русские окончания; отрезается одно, самое длинное из подходящих
+RUSSIAN_SUFFIXES = [
+    "иями", "ость", "ости", "ями", "ами", "ого", "его", "ому", "ему", "ыми",
+    "ими", "ния", "ние", "нии", "ий", "ый", "ой", "ая", "яя", "ое", "ее",
+    "ые", "ие", "ых", "их", "ам", "ям", "ах", "ях", "ом", "ем", "ов", "ев",
+    "ей", "ью", "ии", "ия", "ию", "а", "я", "о", "е", "ы", "и", "у", "ю",
+    "ь", "й",
+]
+SUFFIX_LENGTHS = sorted({len(suffix) for suffix in RUSSIAN_SUFFIXES}, reverse=True)
+SUFFIXES_BY_LENGTH = {
+    length: {suffix for suffix in RUSSIAN_SUFFIXES if len(suffix) == length}
+    for length in SUFFIX_LENGTHS
+}
+MIN_STEM_LENGTH = 3
+CYRILLIC_RE = re.compile(r"[а-я]")
+TOKEN_RE = re.compile(r"[^\W_]+")
+
+
+@lru_cache(maxsize=65536)
+def stem(token):
+    """Cuts one common Russian ending off a lowercased token (stemming-lite)."""
+    if not CYRILLIC_RE.search(token):
+        return token
+    for length in SUFFIX_LENGTHS:
+        if len(token) - length < MIN_STEM_LENGTH:
+            continue
+        if token[-length:] in SUFFIXES_BY_LENGTH[length]:
+            return token[:-length]
+    return token
+
+
+def tokenize(text):
+    """Splits text into lowercased, stemmed search terms."""
+    if not text:
+        return []
+    text = text.lower().replace("ё", "е")
+    return [stem(token) for token in TOKEN_RE.findall(text)]
+
+
+class SearchIndex:
+    """
+    In-process inverted index over short texts.
+
+    Documents are identified by any hashable id and can be added, replaced
+    and removed one by one. A query matches documents containing all of its
+    terms; the last term also matches as a prefix, for search-as-you-type.
+    """
+
+    def __init__(self):
+        self.postings = {}  # {term: set of doc ids}
+        self.doc_terms = {}  # {doc id: frozenset of terms}
+        self._sorted_terms = None  # Отсортированный словарь для поиска по префиксу
+
+    def __len__(self):
+        return len(self.doc_terms)
+
+    def add(self, doc_id, *texts):
+        """Indexes a document; an existing document with this id is replaced."""
+        if doc_id in self.doc_terms:
+            self.remove(doc_id)
+        terms = frozenset(tokenize(" ".join(t for t in texts if t)))
+        self.doc_terms[doc_id] = terms
+        for term in terms:
+            docs = self.postings.get(term)
+            if docs is None:
+                docs = self.postings[term] = set()
+                self._sorted_terms = None
+            docs.add(doc_id)
+
+    def remove(self, doc_id):
+        """Removes a document from the index; unknown ids are ignored."""
+        for term in self.doc_terms.pop(doc_id, ()):
+            docs = self.postings.get(term)
+            if docs is None:
+                continue
+            docs.discard(doc_id)
+            if not docs:
+                del self.postings[term]
+                self._sorted_terms = None
+
+    def _prefix_docs(self, prefix):
+        """Union of postings for every term starting with prefix."""
+        if self._sorted_terms is None:
+            self._sorted_terms = sorted(self.postings)
+        start = bisect.bisect_left(self._sorted_terms, prefix)
+        docs = set()
+        for term in self._sorted_terms[start:]:
+            if not term.startswith(prefix):
+                break
+            docs |= self.postings[term]
+        return docs
+
+    def search(self, query):
+        """Returns the set of ids of documents matching every query term."""
+        terms = tokenize(query)
+        if not terms:
+            return set()
+        candidates = [self.postings.get(term, set()) for term in terms[:-1]]
+        candidates.append(self._prefix_docs(terms[-1]))
+        candidates.sort(key=len)
+        result = set(candidates[0])
+        for docs in candidates[1:]:
+            if not result:
+                break
+            result &= docs
+        return result
+
+
+def term_overlap(query, text):
+    """Share of the query's distinct terms that also occur in text (0..1)."""
+    query_terms = set(tokenize(query))
+    if not query_terms:
+        return 0.0
+    return len(query_terms & set(tokenize(text))) / len(query_terms)
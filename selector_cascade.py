@@ -0,0 +1,124 @@
+import json
+import time
+
+
+class SelectorCascade:
+    """
+    Ordered set of named extraction strategies for one field.
+
+    Each strategy is a function that returns the extracted value or None.
+    The cascade tries strategies until one succeeds and keeps decayed
+    statistics (hit rate and average cost) per strategy. Strategies are
+    registered from the most precise to the broadest fallback, and that
+    precedence is kept: the only change to the order is that strategies
+    that keep failing go last, so after markup drift the failing prefix is
+    skipped. A broader fallback is never tried before a narrower strategy
+    that still works. Every probe_every runs the default order is used, so
+    a skipped strategy that starts working again is noticed.
+    """
+
+    def __init__(self, field, decay=0.9, min_attempts=3, min_hit_rate=0.2, probe_every=50):
+        self.field = field
+        self.decay = decay
+        self.min_attempts = min_attempts
+        self.min_hit_rate = min_hit_rate
+        self.probe_every = probe_every
+        self.runs = 0
+        self.strategies = []  # [(name, func)] в порядке регистрации
+        self.stats = {}  # {name: {"attempts", "hits", "seconds", "total"}}
+
+    def register(self, name, func):
+        """Adds a strategy at the end of the default order."""
+        self.strategies.append((name, func))
+        self.stats.setdefault(
+            name, {"attempts": 0.0, "hits": 0.0, "seconds": 0.0, "total": 0}
+        )
+        return func
+
+    def reset(self):
+        """Forgets the learned statistics and returns to the default order."""
+        self.runs = 0
+        for stats in self.stats.values():
+            stats.update({"attempts": 0.0, "hits": 0.0, "seconds": 0.0, "total": 0})
+
+    def strategy(self, name):
+        """Decorator form of register()."""
+        return lambda func: self.register(name, func)
+
+    def ordered(self):
+        """Strategies in the order they will be tried next."""
+        if self.probe_every and self.runs % self.probe_every == self.probe_every - 1:
+            return list(self.strategies)
+        working, failing = [], []
+        for name, func in self.strategies:
+            stats = self.stats[name]
+            if (
+                stats["total"] >= self.min_attempts
+                and stats["hits"] / stats["attempts"] < self.min_hit_rate
+            ):
+                failing.append((name, func))
+            else:
+                working.append((name, func))
+        return working + failing
+
+    def _record(self, name, hit, seconds):
+        stats = self.stats[name]
+        stats["attempts"] = stats["attempts"] * self.decay + 1
+        stats["hits"] = stats["hits"] * self.decay + (1 if hit else 0)
+        stats["seconds"] = stats["seconds"] * self.decay + seconds
+        stats["total"] += 1
+
+    def run(self, *args):
+        """
+        Tries strategies in learned order. Returns (value, strategy name),
+        or (None, None) if every strategy failed.
+        """
+        order = self.ordered()
+        self.runs += 1
+        for name, func in order:
+            started = time.perf_counter()
+            value = func(*args)
+            hit = value is not None
+            self._record(name, hit, time.perf_counter() - started)
+            if hit:
+                return value, name
+        return None, None
+
+    def report(self):
+        """Rows of per-strategy statistics in the current order."""
+        rows = []
+        for name, _ in self.ordered():
+            stats = self.stats[name]
+            attempts = stats["attempts"]
+            rows.append(
+                {
+                    "field": self.field,
+                    "strategy": name,
+                    "tried": stats["total"],
+                    "hit_rate": round(stats["hits"] / attempts, 3) if attempts else None,
+                    "avg_ms": round(stats["seconds"] / attempts * 1000, 3)
+                    if attempts
+                    else None,
+                }
+            )
+        return rows
+
+
+def save_cascades(cascades, path):
+    """Persists the learned statistics of several cascades to a JSON file."""
+    data = {cascade.field: cascade.stats for cascade in cascades}
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=4)
+
+
+def load_cascades(cascades, path):
+    """Restores learned statistics saved by save_cascades(); unknown names are ignored."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return
+    for cascade in cascades:
+        for name, stats in data.get(cascade.field, {}).items():
+            if name in cascade.stats:
+                cascade.stats[name].update(stats)
@@ -0,0 +1,77 @@
+import copy
+import threading
+
+
+class _Call:
+    """One in-flight load and the callers waiting for it."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical loads.
+
+    The first caller for a key runs the load; callers that arrive with the
+    same key while it is running wait for it and get the same result (or
+    the same exception). Every caller gets its own deep copy of the result,
+    so one caller changing it does not affect the others. Nothing is cached
+    once the load has finished.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = {}  # {key: _Call} для загрузок, которые ещё идут
+        self.loads = 0
+        self.coalesced = 0
+
+    def do(self, key, func, *args, **kwargs):
+        """Returns func(*args, **kwargs), sharing it with concurrent callers of key."""
+        with self.lock:
+            call = self.calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                self.coalesced += 1
+                leader = False
+            else:
+                call = self.calls[key] = _Call()
+                self.loads += 1
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return copy.deepcopy(call.result)
+
+        try:
+            call.result = func(*args, **kwargs)
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self.lock:
+                del self.calls[key]
+            call.done.set()
+        return copy.deepcopy(call.result)
+
+    def in_flight(self):
+        """Number of loads currently running."""
+        with self.lock:
+            return len(self.calls)
+
+    @property
+    def saved(self):
+        """Number of loads avoided by waiting on an in-flight one."""
+        return self.coalesced
+
+    def stats_line(self):
+        """Human-readable summary of the counters."""
+        return (
+            f"Single-flight: {self.loads} loads, "
+            f"{self.coalesced} concurrent duplicates coalesced."
+        )
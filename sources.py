@@ -0,0 +1,215 @@
+import json
+import os
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from assortment import EMOTION, guess_category
+from query_index import normalize_query
+from search_index import term_overlap
+
+
+SOURCE_AFFINITY_PATH = "source_affinity.json"
+
+
+class Source:
+    """
+    A catalog that can be searched for a gift or an experience.
+
+    Subclasses set `name` and implement lookup(query), returning a catalog
+    row (name, price, purchaseUrl, imageUrl, query) or None. lookup() may be
+    called from a worker thread. Sources that return their closest row even
+    when nothing matches set check_relevance, so the router checks that the
+    row's name covers the query; search engines rank results themselves and
+    their names often differ from the query (brand glued to the model, a
+    product type instead of the gift name), so they are not checked.
+    """
+
+    name = "source"
+    check_relevance = False
+
+    def lookup(self, query):
+        raise NotImplementedError
+
+
+class CatalogSource(Source):
+    """
+    A local list of rows, e.g. hand-picked experiences with organizer links
+    in new_emotions.json format. Answers with the row whose name covers the
+    query best, without any network requests.
+    """
+
+    check_relevance = True
+
+    def __init__(self, items, name="catalog"):
+        self.name = name
+        self.items = [
+            item
+            for item in items
+            if isinstance(item, dict) and item.get("name") and item.get("purchaseUrl")
+        ]
+
+    @classmethod
+    def from_file(cls, path, name=None):
+        """Loads rows from a JSON file; a missing file gives an empty source."""
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                items = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            items = []
+        return cls(items, name=name or os.path.splitext(os.path.basename(path))[0])
+
+    def __len__(self):
+        return len(self.items)
+
+    def lookup(self, query):
+        best, best_score = None, 0.0
+        for item in self.items:
+            score = term_overlap(query, item["name"])
+            if score > best_score:
+                best, best_score = item, score
+        if best is None:
+            return None
+        return dict(best, query=query)
+
+
+class SourceRouter:
+    """
+    Looks a query up in several sources and returns the first good result.
+
+    Sources are tried in order of preference: the source that answered this
+    query before (per-query affinity), then sources by how often they won for
+    queries of the same category (gift or experience), then registration
+    order. For experience queries sources with check_relevance (local
+    catalogs) always go first: a search engine answers them with some
+    product card, which would otherwise win every time and be learned. The next source is started when the current ones have failed, or
+    hedged in parallel when none has answered within hedge_after seconds
+    (hedge_after=0 fans out to all sources at once). A result is good if it
+    has a name, price and URL and, for sources with check_relevance, its name
+    covers at least min_relevance of the query terms, so a catalog's closest
+    row for a query it does not carry is rejected.
+    """
+
+    def __init__(self, sources, hedge_after=5.0, min_relevance=0.5):
+        self.sources = list(sources)
+        self.hedge_after = hedge_after
+        self.min_relevance = min_relevance
+        self.affinity = {}  # {нормализованный запрос: имя источника}
+        self.wins = {}  # {категория: {имя источника: число удачных ответов}}
+        self.lock = threading.Lock()
+        self.pool = ThreadPoolExecutor(max_workers=max(len(self.sources), 1))
+        self.direct_hits = 0
+        self.hedged = 0
+        self.misses = 0
+
+    def is_good(self, query, item, source):
+        """Whether a source's answer is complete and relevant to the query."""
+        if not item or not (item.get("name") and item.get("price") and item.get("purchaseUrl")):
+            return False
+        if not source.check_relevance:
+            return True
+        return term_overlap(query, item["name"]) >= self.min_relevance
+
+    def ordered(self, query):
+        """Sources in the order they will be tried for the query."""
+        category = guess_category({"query": query})
+        with self.lock:
+            preferred = self.affinity.get(normalize_query(query))
+            wins = dict(self.wins.get(category, {}))
+        # Впечатления ищем сначала в каталогах: Маркет на такой запрос
+        # всегда найдёт какую-нибудь карточку, и она бы выигрывала
+        emotion = category == EMOTION
+        ranked = sorted(
+            enumerate(self.sources),
+            key=lambda entry: (
+                emotion and not entry[1].check_relevance,
+                entry[1].name != preferred,
+                -wins.get(entry[1].name, 0),
+                entry[0],
+            ),
+        )
+        return [source for _, source in ranked]
+
+    def _safe_lookup(self, source, query):
+        try:
+            return source.lookup(query)
+        except Exception as e:
+            print(f"Source '{source.name}' failed for '{query}': {e}")
+            return None
+
+    def _record(self, query, source_name):
+        key = normalize_query(query)
+        category = guess_category({"query": query})
+        with self.lock:
+            if source_name is None:
+                self.affinity.pop(key, None)
+                self.misses += 1
+                return
+            if self.affinity.get(key) == source_name:
+                self.direct_hits += 1
+            if key:
+                self.affinity[key] = source_name
+            category_wins = self.wins.setdefault(category, {})
+            category_wins[source_name] = category_wins.get(source_name, 0) + 1
+
+    def lookup(self, query):
+        """
+        Returns (row, source name) for the first good answer, or (None, None).
+        Sources still running when a good answer arrives are left to finish
+        in the background; their results are discarded.
+        """
+        pending = self.ordered(query)
+        running = {}
+        hedged = False
+        while pending or running:
+            if pending and (not running or self.hedge_after == 0):
+                source = pending.pop(0)
+                running[self.pool.submit(self._safe_lookup, source, query)] = source
+                continue
+            done, _ = wait(
+                running,
+                timeout=self.hedge_after if pending else None,
+                return_when=FIRST_COMPLETED,
+            )
+            if not done:
+                # Первый источник отвечает слишком долго - параллельно спрашиваем следующий
+                source = pending.pop(0)
+                print(f"  -> No answer in {self.hedge_after}s, also asking '{source.name}'")
+                running[self.pool.submit(self._safe_lookup, source, query)] = source
+                hedged = True
+                continue
+            for future in done:
+                source = running.pop(future)
+                item = future.result()
+                if self.is_good(query, item, source):
+                    if hedged:
+                        with self.lock:
+                            self.hedged += 1
+                    self._record(query, source.name)
+                    return item, source.name
+        self._record(query, None)
+        return None, None
+
+    def load(self, path=SOURCE_AFFINITY_PATH):
+        """Restores affinity and win counts saved by save()."""
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return
+        with self.lock:
+            self.affinity.update(data.get("affinity", {}))
+            for category, counts in data.get("wins", {}).items():
+                self.wins.setdefault(category, {}).update(counts)
+
+    def save(self, path=SOURCE_AFFINITY_PATH):
+        with self.lock:
+            data = {"affinity": self.affinity, "wins": self.wins}
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False, indent=4)
+
+    def stats_line(self):
+        """Human-readable summary of the routing counters."""
+        return (
+            f"Sources: {self.direct_hits} answered by the remembered source, "
+            f"{self.hedged} hedged, {self.misses} without a good answer."
+        )
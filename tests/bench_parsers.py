@@ -0,0 +1,385 @@
+"""
+Offline benchmark for the Market page parsers.
+
+Runs scrape_yandex_market_selenium, scrape_yandex_market_alternatives and
+scrape_price_from_product_page against recorded pages in tests/pages through
+MockDriver, and reports parse time percentiles, peak memory and per-field
+accuracy against golden outputs. Each run of a case is paired with a run of
+a fixed calibration workload, and the fastest case run is stored relative to
+the fastest calibration run, so the baseline can be compared across machines
+and a busy machine slows both sides alike. The allowed slowdown grows with
+the run-to-run spread measured for the case.
+
+    python tests/bench_parsers.py                    # compare with baseline
+    python tests/bench_parsers.py --update-golden    # re-record expected outputs
+    python tests/bench_parsers.py --update-baseline  # store timings and accuracy
+
+Golden outputs are what the parsers *should* return, so review the diff of
+bench_golden.json after --update-golden; values the parsers currently get
+wrong are corrected there by hand.
+"""
+
+import argparse
+import contextlib
+import gzip
+import io
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+# Ensure project root (parent of tests/) is on sys.path so local modules can be imported
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from bs4 import BeautifulSoup
+
+import scrape_market
+from debug_test_alternatives import MockDriver
+
+PAGES_DIR = ROOT / "tests" / "pages"
+GOLDEN_PATH = ROOT / "tests" / "bench_golden.json"
+BASELINE_PATH = ROOT / "tests" / "bench_baseline.json"
+
+ITEM_FIELDS = ["name", "price", "purchaseUrl", "imageUrl"]
+
+
+def drift_markup(html):
+    """Emulates a markup change: the primary card and title markers disappear."""
+    html = html.replace('data-auto="searchOrganic"', 'data-auto="searchResult"')
+    return html.replace('data-zone-name="title"', 'data-zone-name="snippetTitle"')
+
+
+# Записанные страницы: (id, файл, запрос, преобразование разметки, id эталона).
+# Страница с изменённой разметкой сверяется с эталоном исходной страницы:
+# те же товары должны находиться и после смены разметки.
+SEARCH_PAGES = [
+    ("search_kindle", "search_kindle.html.gz", "электронная книга", None, "search_kindle"),
+    (
+        "search_kindle_drift",
+        "search_kindle.html.gz",
+        "электронная книга",
+        drift_markup,
+        "search_kindle",
+    ),
+]
+PRODUCT_PAGES = [
+    ("product_price_value", "product_price_value.html"),
+    ("product_price_text", "product_price_text.html"),
+]
+
+
+def read_page(file_name, transform=None):
+    """Reads a recorded page, gunzipping it if needed."""
+    path = PAGES_DIR / file_name
+    if path.suffix == ".gz":
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            html = f.read()
+    else:
+        html = path.read_text(encoding="utf-8")
+    return transform(html) if transform else html
+
+
+def build_cases():
+    """
+    Returns benchmark cases as
+    (case id, golden id, html, function(driver) -> output).
+    """
+    cases = []
+    for page_id, file_name, query, transform, golden_id in SEARCH_PAGES:
+        html = read_page(file_name, transform)
+        cases.append(
+            (
+                f"selenium/{page_id}",
+                f"selenium/{golden_id}",
+                html,
+                lambda driver, query=query: dict(
+                    zip(
+                        ITEM_FIELDS,
+                        scrape_market.scrape_yandex_market_selenium(driver, query),
+                    )
+                ),
+            )
+        )
+        cases.append(
+            (
+                f"alternatives/{page_id}",
+                f"alternatives/{golden_id}",
+                html,
+                lambda driver, query=query: scrape_market.scrape_yandex_market_alternatives(
+                    driver, query, num_results=8
+                ),
+            )
+        )
+    for page_id, file_name in PRODUCT_PAGES:
+        cases.append(
+            (
+                f"product_price/{page_id}",
+                f"product_price/{page_id}",
+                read_page(file_name),
+                lambda driver, page_id=page_id: {
+                    "price": scrape_market.scrape_price_from_product_page(
+                        driver, f"{scrape_market.MARKET_HOST}/card/{page_id}/1"
+                    )
+                },
+            )
+        )
+    return cases
+
+
+@contextlib.contextmanager
+def offline_run():
+    """
+    Silences parser logging, skips the politeness sleeps and runs in a
+    temporary directory (the search parser writes debug_page.html).
+    """
+    original_sleep = time.sleep
+    original_cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as workdir:
+        time.sleep = lambda seconds: None
+        os.chdir(workdir)
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                yield
+        finally:
+            os.chdir(original_cwd)
+            time.sleep = original_sleep
+
+
+def reset_selectors():
+    """Every measurement starts from the default selector order."""
+    for cascade in scrape_market.ALL_CASCADES:
+        cascade.reset()
+
+
+CALIBRATION_HTML = "<html><body>" + "".join(
+    f'<div class="card c{i}"><a href="/card/x/{i}">Товар {i}</a>'
+    f'<span class="price">{i * 10} ₽</span></div>'
+    for i in range(500)
+) + "</body></html>"
+
+
+def calibrate():
+    """Time to parse a fixed synthetic document with html.parser."""
+    started = time.perf_counter()
+    BeautifulSoup(CALIBRATION_HTML, "html.parser").find_all("span")
+    return time.perf_counter() - started
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a list of values."""
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, round(fraction * len(ordered)) - 1))
+    return ordered[rank]
+
+
+def measure(html, func, repeat):
+    """
+    Returns (output, timings in seconds, calibration timings in seconds,
+    peak traced memory in bytes). Every run of func is preceded by a
+    calibration run, so both see the same machine load.
+    """
+    driver = MockDriver(html)
+    timings = []
+    calibrations = []
+    output = None
+    with offline_run():
+        # Прогревочный запуск не учитываем: импорт и кэши regex на первом вызове
+        reset_selectors()
+        calibrate()
+        func(driver)
+        for _ in range(repeat):
+            calibrations.append(calibrate())
+            reset_selectors()
+            started = time.perf_counter()
+            output = func(driver)
+            timings.append(time.perf_counter() - started)
+        reset_selectors()
+        tracemalloc.start()
+        func(driver)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return output, timings, calibrations, peak
+
+
+def best_units(timings, calibrations):
+    """Fastest run of a case in units of the fastest calibration run."""
+    return min(timings) / min(calibrations)
+
+
+def relative_spread(timings, calibrations):
+    """
+    Run-to-run noise of best_units(): how far the values computed from the
+    odd and the even runs disagree, relative to the smaller one.
+    """
+    odd = best_units(timings[::2], calibrations[::2])
+    even = best_units(timings[1::2], calibrations[1::2])
+    return abs(odd - even) / min(odd, even)
+
+
+def field_accuracy(output, golden):
+    """{field: share of matching values} between an output and its golden copy."""
+    if isinstance(golden, dict):
+        return {field: float(output.get(field) == value) for field, value in golden.items()}
+
+    # Списки альтернатив сравниваем по позициям; лишние и недостающие - ошибки
+    accuracy = {"count": float(len(output) == len(golden))}
+    total = max(len(output), len(golden))
+    for field in ITEM_FIELDS:
+        if not total:
+            accuracy[field] = 1.0
+            continue
+        matches = sum(
+            1
+            for got, expected in zip(output, golden)
+            if got.get(field) == expected.get(field)
+        )
+        accuracy[field] = matches / total
+    return accuracy
+
+
+def load_json(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def save_json(path, data):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=4)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=15, help="runs per case")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.5,
+        help="allowed memory growth over the baseline (0.5 = +50%%)",
+    )
+    parser.add_argument(
+        "--time-tolerance",
+        type=float,
+        default=0.15,
+        help="minimum allowed slowdown of the best run over the baseline (0.15 = +15%%)",
+    )
+    parser.add_argument(
+        "--noise-factor",
+        type=float,
+        default=3.0,
+        help="allowed slowdown in multiples of the measured run-to-run spread",
+    )
+    parser.add_argument(
+        "--min-slowdown-ms",
+        type=float,
+        default=2.0,
+        help="slowdowns smaller than this are treated as noise",
+    )
+    parser.add_argument("--update-golden", action="store_true")
+    parser.add_argument("--update-baseline", action="store_true")
+    args = parser.parse_args()
+
+    golden = load_json(GOLDEN_PATH)
+    baseline = load_json(BASELINE_PATH)
+
+    results = {}
+    new_golden = {}
+    for case_id, golden_id, html, func in build_cases():
+        output, timings, calibrations, peak = measure(html, func, args.repeat)
+        if case_id == golden_id:
+            new_golden[case_id] = output
+        accuracy = (
+            field_accuracy(output, golden[golden_id]) if golden_id in golden else {}
+        )
+        results[case_id] = {
+            "p50_ms": round(statistics.median(timings) * 1000, 2),
+            "p90_ms": round(percentile(timings, 0.9) * 1000, 2),
+            "max_ms": round(max(timings) * 1000, 2),
+            "min_units": round(best_units(timings, calibrations), 5),
+            "spread": round(relative_spread(timings, calibrations), 3),
+            "unit_ms": min(calibrations) * 1000,
+            "peak_kb": round(peak / 1024),
+            "accuracy": accuracy,
+        }
+
+    print(
+        f"\n{'case':<40} {'p50 ms':>9} {'p90 ms':>9} {'max ms':>9} "
+        f"{'peak KB':>9}  accuracy"
+    )
+    for case_id, row in results.items():
+        fields = ", ".join(
+            f"{field}={value:.2f}" for field, value in row["accuracy"].items()
+        ) or "no golden"
+        print(
+            f"{case_id:<40} {row['p50_ms']:>9} {row['p90_ms']:>9} "
+            f"{row['max_ms']:>9} {row['peak_kb']:>9}  {fields}"
+        )
+
+    if args.update_golden:
+        save_json(GOLDEN_PATH, new_golden)
+        print(f"\nGolden outputs saved to {GOLDEN_PATH.name}")
+    if args.update_baseline:
+        save_json(
+            BASELINE_PATH,
+            {
+                case_id: {
+                    key: row[key]
+                    for key in ("p50_ms", "min_units", "spread", "peak_kb", "accuracy")
+                }
+                for case_id, row in results.items()
+            },
+        )
+        print(f"Baseline saved to {BASELINE_PATH.name}")
+    if args.update_golden or args.update_baseline:
+        return
+
+    # Сравнение с базовой линией: лучшее время в единицах калибровки, память и точность
+    regressions = []
+    for case_id, row in results.items():
+        reference = baseline.get(case_id)
+        if not reference:
+            continue
+        for field, value in row["accuracy"].items():
+            expected = reference.get("accuracy", {}).get(field, 1.0)
+            if value < expected:
+                regressions.append(
+                    f"{case_id}: {field} accuracy {value:.2f} vs baseline {expected:.2f}"
+                )
+        if "min_units" in reference:
+            # Допуск растёт с разбросом замеров - и текущих, и базовых
+            allowed = max(
+                args.time_tolerance,
+                args.noise_factor * max(row["spread"], reference.get("spread", 0)),
+            )
+            slowdown_ms = (row["min_units"] - reference["min_units"]) * row["unit_ms"]
+            if (
+                row["min_units"] > reference["min_units"] * (1 + allowed)
+                and slowdown_ms > args.min_slowdown_ms
+            ):
+                regressions.append(
+                    f"{case_id}: best run {row['min_units']} vs baseline "
+                    f"{reference['min_units']} calibration units (allowed +{allowed:.0%})"
+                )
+        if row["peak_kb"] > reference["peak_kb"] * (1 + args.tolerance):
+            regressions.append(
+                f"{case_id}: peak {row['peak_kb']} KB vs baseline {reference['peak_kb']} KB"
+            )
+
+    if regressions:
+        print("\nRegressions:")
+        for line in regressions:
+            print(f"  {line}")
+        # exit non-zero so test harnesses will notice
+        raise SystemExit(1)
+    print("\nNo regressions against the baseline.")
+
+
+if __name__ == "__main__":
+    main()
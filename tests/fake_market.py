@@ -0,0 +1,220 @@
+"""
+Local fake Yandex Market for offline load tests.
+
+Serves templated search pages (/search?text=...) and product pages
+(/card/<slug>/<id>) with the markup the parsers in scrape_market.py expect.
+Latency, captcha rate and error rate are configurable. Run it standalone to
+point the app at it:
+
+    python tests/fake_market.py --port 8765 --latency-ms 300
+    MARKET_HOST=http://127.0.0.1:8765 streamlit run app.py
+"""
+
+import argparse
+import html
+import random
+import threading
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+class FakeMarketConfig:
+    """Behaviour of the fake server."""
+
+    def __init__(
+        self,
+        latency_ms=0,
+        jitter_ms=0,
+        captcha_rate=0.0,
+        error_rate=0.0,
+        cards_per_page=12,
+        seed=None,
+    ):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.captcha_rate = captcha_rate
+        self.error_rate = error_rate
+        self.cards_per_page = cards_per_page
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+
+    def delay(self):
+        """Seconds to wait before answering a request."""
+        with self.lock:
+            jitter = self.random.uniform(-self.jitter_ms, self.jitter_ms)
+        return max(0.0, self.latency_ms + jitter) / 1000
+
+    def outcome(self):
+        """'captcha', 'error' or 'ok' for the next request."""
+        with self.lock:
+            roll = self.random.random()
+        if roll < self.captcha_rate:
+            return "captcha"
+        if roll < self.captcha_rate + self.error_rate:
+            return "error"
+        return "ok"
+
+
+CAPTCHA_PAGE = """<html><head><title>Ой!</title></head><body>
+<div class="CheckboxCaptcha"><form action="/checkcaptcha">
+<p>Подтвердите, что запросы отправляли вы, а не робот</p>
+<input type="checkbox" id="js-button"></form></div></body></html>"""
+
+ERROR_PAGE = "<html><body><h1>500 Internal Server Error</h1></body></html>"
+
+
+def product_id(query, position):
+    """Stable numeric product ID for a query and a card position."""
+    return 100000000000 + zlib.crc32(f"{query}|{position}".encode("utf-8")) % 10**9
+
+
+def product_price(card_id):
+    """Stable price in rubles for a product ID."""
+    return 500 + card_id % 49500
+
+
+def product_rating(card_id):
+    """Stable (rating, review count) for a product ID; (None, 0) if unrated."""
+    if card_id % 7 == 0:
+        return None, 0
+    return round(3.5 + card_id % 16 / 10, 1), card_id % 3000
+
+
+def render_card(query, position):
+    """One search result card in current Market markup."""
+    card_id = product_id(query, position)
+    title = html.escape(f"{query} — вариант {position + 1}")
+    sponsored = "&sponsored=1" if position % 3 == 0 else ""
+    href = f"/card/item-{card_id}/{card_id}?do-waremd5=fake{position}{sponsored}&cpc=x"
+    price = f"{product_price(card_id):,}".replace(",", " ")
+    rating, reviews = product_rating(card_id)
+    rating_block = ""
+    if rating:
+        value = str(rating).replace(".", ",")
+        count = f"{reviews:,}".replace(",", "\u2009")
+        rating_block = (
+            f'<div data-zone-name="rating"><span aria-label="Рейтинг {value} из 5">'
+            f"{value}</span> <span>({count})</span></div>"
+        )
+    return f"""<article data-auto="searchOrganic">
+  <div data-zone-name="productSnippet">
+    <a data-auto="galleryLink" href="{href}"><img src="//avatars.example/{card_id}/orig" alt="{title}"></a>
+    <a data-zone-name="title" href="{href}"><h3 data-auto="snippet-title">{title}</h3></a>
+    {rating_block}
+    <div data-zone-name="price"><span data-auto="snippet-price-current"><span data-auto="price-value">{price}</span> ₽</span></div>
+  </div>
+</article>"""
+
+
+def render_search_page(query, cards):
+    """Search results page for a query."""
+    body = "\n".join(render_card(query, position) for position in range(cards))
+    return (
+        f"<html><head><title>{html.escape(query)} — Яндекс Маркет</title></head>"
+        f'<body><div data-zone-name="searchResults">{body}</div></body></html>'
+    )
+
+
+def render_product_page(card_id):
+    """Product page with a price."""
+    price = f"{product_price(card_id):,}".replace(",", " ")
+    return (
+        f"<html><body><h1 data-auto=\"productCardTitle\">Товар {card_id}</h1>"
+        f'<div data-zone-name="price"><span data-auto="price-value">{price}</span>'
+        f"<span>₽</span></div></body></html>"
+    )
+
+
+class FakeMarketHandler(BaseHTTPRequestHandler):
+    """Request handler; the config and counters live on the server object."""
+
+    def do_GET(self):
+        server = self.server
+        # Не time.sleep: нагрузочный тест отключает его для скраперов
+        threading.Event().wait(server.config.delay())
+        outcome = server.config.outcome()
+        parsed = urlparse(self.path)
+
+        status, page = 200, None
+        if outcome == "captcha":
+            page = CAPTCHA_PAGE
+        elif outcome == "error":
+            status, page = 500, ERROR_PAGE
+        elif parsed.path == "/search":
+            query = parse_qs(parsed.query).get("text", [""])[0]
+            page = render_search_page(query, server.config.cards_per_page)
+        elif parsed.path.startswith("/card/"):
+            card_id = parsed.path.rstrip("/").rsplit("/", 1)[-1]
+            if card_id.isdigit():
+                page = render_product_page(int(card_id))
+        if page is None:
+            status, page = 404, "<html><body>Not found</body></html>"
+
+        server.count(outcome if status != 404 else "not_found")
+        payload = page.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        # Не засоряем вывод нагрузочного теста логом каждого запроса
+        pass
+
+
+class FakeMarketServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, config):
+        super().__init__(address, FakeMarketHandler)
+        self.config = config
+        self.counters = {"ok": 0, "captcha": 0, "error": 0, "not_found": 0}
+        self.counters_lock = threading.Lock()
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def count(self, outcome):
+        with self.counters_lock:
+            self.counters[outcome] += 1
+
+
+def start_server(config=None, host="127.0.0.1", port=0):
+    """Starts the fake Market in a background thread and returns the server."""
+    server = FakeMarketServer((host, port), config or FakeMarketConfig())
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local fake Yandex Market")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--jitter-ms", type=float, default=0)
+    parser.add_argument("--captcha-rate", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--cards", type=int, default=12)
+    args = parser.parse_args()
+
+    config = FakeMarketConfig(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        captcha_rate=args.captcha_rate,
+        error_rate=args.error_rate,
+        cards_per_page=args.cards,
+    )
+    server = FakeMarketServer(("127.0.0.1", args.port), config)
+    print(f"Fake Market listening on {server.base_url} (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,275 @@
+"""
+End-to-end load test against a local fake Market (tests/fake_market.py).
+
+Drives the batch path (scrape_market.scrape_batch) and the app's scrape
+flows (alternatives for "Заменить", product page price for "Выбрать") with
+several concurrent workers, each with its own HTTP-backed driver, and
+reports throughput, fetch and call latency percentiles, outcome counts,
+coalesced duplicate loads and peak memory (RSS, POSIX only). Politeness sleeps are skipped, so the numbers reflect parsing,
+the network stack and the configured server latency.
+
+    python tests/load_harness.py --queries 2000 --workers 8 --latency-ms 50 \\
+        --captcha-rate 0.02 --error-rate 0.01
+
+--copies N sends every query N times in a row; consecutive queries go to
+different workers, so the copies arrive concurrently, as from several app
+sessions.
+"""
+
+import argparse
+import statistics
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:
+    # Модуль есть только в POSIX; в Windows пиковую память не показываем
+    resource = None
+
+# Ensure project root (parent of tests/) is on sys.path so local modules can be imported
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+import scrape_market
+from bench_parsers import offline_run
+from fake_market import FakeMarketConfig, start_server
+from query_index import QueryIndex
+
+INPUT_FILES = ["200podarkov.txt", "unique_gifts.txt", "est.md"]
+
+
+class HttpDriver:
+    """
+    Minimal stand-in for a Selenium driver that fetches pages over HTTP,
+    like MockDriver but against a real server. Fetch latencies are recorded.
+    """
+
+    def __init__(self, latencies, timeout=30):
+        self.page_source = ""
+        self.latencies = latencies
+        self.timeout = timeout
+
+    def get(self, url):
+        started = time.perf_counter()
+        try:
+            with urllib.request.urlopen(url, timeout=self.timeout) as response:
+                self.page_source = response.read().decode("utf-8")
+        except urllib.error.HTTPError as e:
+            self.page_source = e.read().decode("utf-8", errors="replace")
+        except OSError:
+            self.page_source = ""
+        self.latencies.append(time.perf_counter() - started)
+
+    def find_element(self, *args, **kwargs):
+        # WebDriverWait calls find_element; return a truthy placeholder
+        class Dummy:
+            def get_attribute(self, name):
+                return ""
+
+        return Dummy()
+
+    def quit(self):
+        pass
+
+
+def load_queries(count, copies=1):
+    """
+    Builds `count` queries from the project's gift lists: count // copies
+    distinct ones, each repeated `copies` times in a row.
+    """
+    base = []
+    for file_name in INPUT_FILES:
+        try:
+            with open(ROOT / file_name, "r", encoding="utf-8") as f:
+                base.extend(line.strip() for line in f if line.strip())
+        except FileNotFoundError:
+            continue
+    base = list(dict.fromkeys(base)) or ["подарок"]
+    # Номер в конце делает запросы различными и для индекса запросов
+    distinct = [
+        f"{base[i % len(base)]} {i // len(base) + 1}"
+        for i in range(-(-count // copies))
+    ]
+    return [query for query in distinct for _ in range(copies)][:count]
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a list of values."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, round(fraction * len(ordered)) - 1))
+    return ordered[rank]
+
+
+def run_scenario(name, queries, workers, work):
+    """
+    Splits queries across workers; work(driver, chunk, call_latencies)
+    returns the number of successful results. Returns a stats dict.
+    """
+    chunks = [queries[i::workers] for i in range(workers)]
+    fetch_latencies = []
+    call_latencies = []
+    lock = threading.Lock()
+
+    def worker(chunk):
+        local_fetches, local_calls = [], []
+        driver = HttpDriver(local_fetches)
+        successes = work(driver, chunk, local_calls)
+        with lock:
+            fetch_latencies.extend(local_fetches)
+            call_latencies.extend(local_calls)
+        return successes
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        successes = sum(pool.map(worker, chunks))
+    elapsed = time.perf_counter() - started
+
+    return {
+        "scenario": name,
+        "queries": len(queries),
+        "successes": successes,
+        "seconds": elapsed,
+        "throughput": len(queries) / elapsed if elapsed else 0.0,
+        "fetch_p50": statistics.median(fetch_latencies) if fetch_latencies else 0.0,
+        "fetch_p95": percentile(fetch_latencies, 0.95),
+        "fetch_p99": percentile(fetch_latencies, 0.99),
+        "call_p50": statistics.median(call_latencies) if call_latencies else 0.0,
+        "call_p95": percentile(call_latencies, 0.95),
+        "call_p99": percentile(call_latencies, 0.99),
+    }
+
+
+def batch_work(driver, chunk, call_latencies):
+    """
+    Batch path: scrape_batch query by query with one query index for the
+    chunk, so every query gets its own latency. Products already counted
+    in the chunk are skipped, as scrape_batch does within one batch.
+    """
+    query_index = QueryIndex()
+    seen_products = set()
+    successes = 0
+    for query in chunk:
+        started = time.perf_counter()
+        rows, _ = scrape_market.scrape_batch(driver, [query], query_index, delay=0)
+        call_latencies.append(time.perf_counter() - started)
+        for row in rows:
+            product_id = row.get("productId")
+            if product_id in seen_products:
+                continue
+            if product_id:
+                seen_products.add(product_id)
+            successes += bool(row.get("price"))
+    return successes
+
+
+def alternatives_work(driver, chunk, call_latencies):
+    """App flow for "Заменить": alternatives for every query."""
+    successes = 0
+    for query in chunk:
+        started = time.perf_counter()
+        alternatives = scrape_market.coalesced_alternatives(driver, query)
+        call_latencies.append(time.perf_counter() - started)
+        successes += bool(alternatives)
+    return successes
+
+
+def product_price_work(driver, chunk, call_latencies):
+    """App flow for "Выбрать": price from the product page."""
+    from fake_market import product_id
+
+    successes = 0
+    for query in chunk:
+        card_id = product_id(query, len(query) % 5)
+        url = f"{scrape_market.MARKET_HOST}/card/item-{card_id}/{card_id}"
+        started = time.perf_counter()
+        price = scrape_market.coalesced_product_price(driver, url)
+        call_latencies.append(time.perf_counter() - started)
+        successes += bool(price)
+    return successes
+
+
+SCENARIOS = {
+    "batch": batch_work,
+    "alternatives": alternatives_work,
+    "product_price": product_price_work,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test against a local fake Market")
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--latency-ms", type=float, default=20)
+    parser.add_argument("--jitter-ms", type=float, default=10)
+    parser.add_argument("--captcha-rate", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--cards", type=int, default=12, help="cards per search page")
+    parser.add_argument(
+        "--scenario",
+        choices=["all"] + list(SCENARIOS),
+        default="all",
+    )
+    parser.add_argument("--copies", type=int, default=1, help="times each query is sent")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    config = FakeMarketConfig(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        captcha_rate=args.captcha_rate,
+        error_rate=args.error_rate,
+        cards_per_page=args.cards,
+        seed=args.seed,
+    )
+    server = start_server(config)
+    original_host = scrape_market.MARKET_HOST
+    scrape_market.MARKET_HOST = server.base_url
+    print(f"Fake Market at {server.base_url}")
+
+    queries = load_queries(args.queries, max(args.copies, 1))
+    names = list(SCENARIOS) if args.scenario == "all" else [args.scenario]
+    results = []
+    try:
+        for name in names:
+            with offline_run():
+                results.append(run_scenario(name, queries, args.workers, SCENARIOS[name]))
+    finally:
+        scrape_market.MARKET_HOST = original_host
+        server.shutdown()
+
+    print(
+        f"\n{'scenario':<15} {'queries':>8} {'ok':>7} {'q/s':>8} "
+        f"{'fetch p50/p95/p99 ms':>24} {'call p50/p95/p99 ms':>24}"
+    )
+    for row in results:
+        fetch = "/".join(
+            f"{row[key] * 1000:.0f}" for key in ("fetch_p50", "fetch_p95", "fetch_p99")
+        )
+        call = "/".join(
+            f"{row[key] * 1000:.0f}" for key in ("call_p50", "call_p95", "call_p99")
+        )
+        print(
+            f"{row['scenario']:<15} {row['queries']:>8} {row['successes']:>7} "
+            f"{row['throughput']:>8.1f} {fetch:>24} {call:>24}"
+        )
+
+    print(f"\nServer responses: {server.counters}")
+    print(scrape_market.SCRAPE_FLIGHTS.stats_line())
+    if resource is not None:
+        # ru_maxrss в Linux - килобайты
+        peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        print(f"Peak RSS: {peak_mb:.0f} MB")
+    else:
+        print("Peak RSS: not available on this platform")
+
+
+if __name__ == "__main__":
+    main()
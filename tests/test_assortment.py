@@ -0,0 +1,146 @@
+import sys
+from pathlib import Path
+
+# Ensure project root (parent of tests/) is on sys.path so local modules can be imported
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from assortment import EMOTION, GIFT, guess_category, solve_assortment
+
+
+def category(name):
+    return guess_category({"name": name})
+
+
+def test_experiences_are_recognized():
+    # Строки из 200podarkov.txt
+    names = [
+        "Полет в аэротрубе (сертификат)",
+        "Посещение бани с вениками",
+        "Пейнтбол для компании 6 человек",
+        "Поход в театр Большой",
+        "Ночная фотопрогулка с фотографом",
+        "СПА программа Oriental Relax",
+        "Винный дегустационный вечер",
+    ]
+    for name in names:
+        assert category(name) == EMOTION, name
+
+
+def test_goods_with_experience_stems_are_gifts():
+    names = [
+        "Массажер для шеи и плеч",
+        "СПА-бассейн надувной",
+        "Набор для дегустации виски",
+        "Скульптура из бронзы",
+        "Йога мат толщиной 6мм",
+        "Проектор для дома (мини-кинотеатр)",
+        "Умный сад с автоматической циркуляцией воды",
+        "Турка для кофе медная",
+    ]
+    for name in names:
+        assert category(name) == GIFT, name
+
+
+def slot(index, *prices, category=GIFT, ids=None):
+    ids = ids or [f"{index}-{price}" for price in prices]
+    return {
+        "index": index,
+        "category": category,
+        "candidates": [
+            {"name": f"Товар {product_id}", "price": str(price), "productId": product_id}
+            for price, product_id in zip(prices, ids)
+        ],
+    }
+
+
+def picked_prices(result):
+    return {index: int(item["price"]) for index, item in result["assignment"].items()}
+
+
+def test_budget_is_a_limit():
+    slots = [slot(0, 1000, 3000, 5000), slot(1, 1000, 3000, 5000)]
+    result = solve_assortment(slots, budget=7000)
+    # 8000 ближе к 7000 по модулю, но превышает бюджет
+    assert result["total"] == 6000
+    assert result["over_budget"] == 0
+    assert sum(picked_prices(result).values()) == result["total"]
+
+
+def test_budget_is_reached_when_possible():
+    slots = [slot(0, 1000, 2000, 4000), slot(1, 500, 3000), slot(2, 700, 1500)]
+    result = solve_assortment(slots, budget=8500)
+    assert picked_prices(result) == {0: 4000, 1: 3000, 2: 1500}
+    assert result["over_budget"] == 0
+
+
+def test_infeasible_budget_is_reported():
+    slots = [slot(i, 4000, 9000) for i in range(3)]
+    result = solve_assortment(slots, budget=10000)
+    assert result["total"] == 12000
+    assert result["over_budget"] == 2000
+
+
+def test_product_fills_one_slot_only():
+    # Одинаковый productId в двух строках, как 4389411107 в podarki.json
+    slots = [
+        slot(0, 1000, 2500, ids=["4389411107", "a"]),
+        slot(1, 1000, ids=["4389411107"]),
+        slot(2, 1500, 1600, ids=["b", "a"]),
+    ]
+    result = solve_assortment(slots)
+    ids = [item["productId"] for item in result["assignment"].values()]
+    assert len(ids) == len(set(ids))
+    assert result["unfilled"] == [1]
+
+    result = solve_assortment(slots, budget=10000)
+    ids = [item["productId"] for item in result["assignment"].values()]
+    assert len(ids) == len(set(ids))
+    assert result["total"] <= 10000
+
+
+def test_duplicates_are_checked_by_url_without_product_id():
+    slots = [
+        {"index": 0, "category": GIFT, "candidates": [{"price": "100", "purchaseUrl": "https://a/1"}]},
+        {"index": 1, "category": GIFT, "candidates": [{"price": "100", "purchaseUrl": "https://a/1"}]},
+    ]
+    result = solve_assortment(slots, budget=1000)
+    assert list(result["assignment"]) == [0]
+    assert result["unfilled"] == [1]
+
+
+def test_quotas_price_band_and_shortage():
+    slots = [
+        slot(0, 1000),
+        slot(1, 20000),
+        slot(2, 3000, category=EMOTION),
+        slot(3, 2000),
+        slot(4, 500),
+    ]
+    result = solve_assortment(
+        slots, min_price=900, max_price=10000, quotas={GIFT: 2, EMOTION: 2}
+    )
+    assert sorted(result["assignment"]) == [0, 2, 3]
+    assert result["shortage"] == {EMOTION: 1}
+    assert result["unfilled"] == [1, 4]
+    assert result["over_budget"] == 0
+
+
+def test_random_catalog_stays_unique_and_under_budget():
+    import random
+
+    rnd = random.Random(1)
+    pool = [(str(i), rnd.randint(300, 30000)) for i in range(1500)]
+    slots = []
+    for index in range(500):
+        picks = rnd.sample(pool, 6)
+        slots.append(
+            slot(index, *[price for _, price in picks], ids=[pid for pid, _ in picks])
+        )
+    for budget in (1_000_000, 5_000_000, 20_000_000):
+        result = solve_assortment(slots, budget=budget)
+        ids = [item["productId"] for item in result["assignment"].values()]
+        assert len(ids) == len(set(ids))
+        assert result["total"] == sum(picked_prices(result).values())
+        assert result["over_budget"] == max(0, result["total"] - budget)
+        if budget >= 5_000_000:
+            assert result["total"] <= budget
@@ -0,0 +1,92 @@
+import json
+import sys
+from pathlib import Path
+
+# Ensure project root (parent of tests/) is on sys.path so local modules can be imported
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import catalog
+from catalog import (
+    catalog_stats,
+    catalog_to_frame,
+    filter_catalog,
+    frame_to_items,
+    load_items,
+    normalize_item,
+    sort_catalog,
+)
+
+ROWS = [
+    {"name": "Термос", "price": "2 990 ₽", "purchaseUrl": "https://a/1", "imageUrl": None, "query": "термос"},
+    {"name": "альбом", "price": None, "purchaseUrl": "https://a/2", "imageUrl": "https://i/2"},
+    {"name": "Набор", "price": 500, "purchaseUrl": None, "imageUrl": None, "comment": "на НГ"},
+    {"name": "Часы", "price": "15000", "purchaseUrl": "https://a/4", "imageUrl": None, "productId": "4"},
+]
+
+
+def test_rows_survive_the_frame_round_trip():
+    items = frame_to_items(catalog_to_frame(ROWS))
+    assert items[0] == {
+        "name": "Термос",
+        "price": "2990",
+        "purchaseUrl": "https://a/1",
+        "imageUrl": None,
+        "query": "термос",
+    }
+    assert items[2]["price"] == "500" and items[2]["comment"] == "на НГ"
+    assert items[3]["productId"] == "4"
+    assert [normalize_item(row) for row in ROWS] == items
+
+
+def test_load_items_reads_small_files_without_cache(tmp_path):
+    path = tmp_path / "podarki.json"
+    cache = tmp_path / "podarki.parquet"
+    path.write_text(json.dumps(ROWS + ["мусор"], ensure_ascii=False), encoding="utf-8")
+    items = load_items(str(path), str(cache))
+    assert items[:4] == frame_to_items(catalog_to_frame(ROWS))
+    assert items[4] == {"name": None, "price": None, "purchaseUrl": None, "imageUrl": None}
+    assert not cache.exists()
+    assert load_items(str(tmp_path / "missing.json"), str(cache)) == []
+
+
+def test_large_files_go_through_the_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(catalog, "CACHE_MIN_BYTES", 1)
+    writes = []
+    monkeypatch.setattr(catalog, "_write_cache", lambda frame, path: writes.append(path))
+    path = tmp_path / "podarki.json"
+    path.write_text(json.dumps(ROWS, ensure_ascii=False), encoding="utf-8")
+    assert load_items(str(path), str(tmp_path / "podarki.parquet")) == [
+        normalize_item(row) for row in ROWS
+    ]
+    assert writes == [str(tmp_path / "podarki.parquet")]
+
+
+def test_unwritable_cache_is_ignored(tmp_path):
+    # Каталог кэша не существует - запись падает, загрузка - нет
+    catalog._write_cache(catalog_to_frame(ROWS), str(tmp_path / "missing" / "c.parquet"))
+
+
+def test_filter_catalog():
+    frame = catalog_to_frame(ROWS)
+    assert list(filter_catalog(frame, 1000, 5000).index) == [0, 1]
+    assert list(filter_catalog(frame, 1000, 5000, include_unpriced=False).index) == [0]
+    assert list(filter_catalog(frame, max_price=1000, include_unpriced=False).index) == [2]
+
+
+def test_sort_catalog():
+    frame = catalog_to_frame(ROWS)
+    assert list(sort_catalog(frame, "Цена ↑").index) == [2, 0, 3, 1]
+    assert list(sort_catalog(frame, "Цена ↓").index) == [3, 0, 2, 1]
+    assert list(sort_catalog(frame, "Название").index) == [1, 2, 0, 3]
+    assert list(sort_catalog(frame, "Как в списке").index) == [0, 1, 2, 3]
+
+
+def test_catalog_stats():
+    stats = catalog_stats(catalog_to_frame(ROWS))
+    assert (stats["count"], stats["priced"], stats["total"], stats["average"]) == (4, 3, 18490, 6163)
+    bands = stats["bands"]
+    assert bands.loc["до 1 000", "Позиций"] == 1
+    assert bands.loc["1 000–3 000", "Сумма, ₽"] == 2990
+    assert bands.loc["10 000–20 000", "Позиций"] == 1
+    assert bands["Позиций"].sum() == 3
+    assert catalog_stats(catalog_to_frame([]))["average"] == 0
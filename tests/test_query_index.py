@@ -0,0 +1,56 @@
+import sys
+from pathlib import Path
+
+# Ensure project root (parent of tests/) is on sys.path so local modules can be imported
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from query_index import QueryIndex, normalize_query
+
+
+def build_index(*queries):
+    index = QueryIndex()
+    for query in queries:
+        index.add(query, {"name": query})
+    return index
+
+
+def test_normalized_variants_are_exact_hits():
+    assert normalize_query("Термос, для чая!") == normalize_query("чая термос")
+    index = build_index("Термос для чая")
+    result, score = index.find("термос  ЧАЯ")
+    assert result["name"] == "Термос для чая"
+    assert score == 1.0
+
+
+def test_word_form_variants_are_near_hits():
+    index = build_index("Подарочный набор для медитаций")
+    result, score = index.find("Подарочный набор для медитации")
+    assert result["name"] == "Подарочный набор для медитаций"
+    assert 0.8 <= score < 1.0
+
+
+def test_different_models_are_not_near_hits():
+    # Пары из 200podarkov.txt, похожие по триграммам, но разные товары
+    pairs = [
+        ("Apple AirPods 2", "Apple AirPods Pro 2"),
+        ("AirPods Pro 2", "Apple AirPods 2"),
+        ("Рюкзак туристический 40л водонепроницаемый черный", "Рюкзак туристический 50л водонепроницаемый черный"),
+        ("Фотоаппарат Canon EOS 1200D Kit 18-55mm", "Фотоаппарат Canon EOS 2000D Kit 18-55mm"),
+        ("Электрическая цепная пила 1600Вт 14 дюймов", "Электрическая цепная пила 1600Вт 18 дюймов"),
+        ("Рюкзак туристический 40л водонепроницаемый черный", "Рюкзак туристический 40л водонепроницаемый зеленый"),
+        ("Кольцо серебряное 925 пробы с фианитом", "Кольцо тонкое серебряное 925 пробы с фианитом"),
+        ("Кольцо серебряное 925 пробы родированное", "Кольцо разъемное серебряное 925 пробы родированное"),
+        ("Кольцо серебряное 925 пробы родированное", "Кольцо широкое серебряное 925 пробы родированное"),
+        ("Настольная игра Мемфликс для взрослых", "Настольная игра Мемфликс для взрослых и детей"),
+    ]
+    for stored, query in pairs:
+        result, _ = build_index(stored).find(query)
+        assert result is None, f"'{query}' reused the result of '{stored}'"
+
+
+def test_lookup_counts_hits_and_misses():
+    index = build_index("Настольная игра Эверделл")
+    index.lookup("настольная игра эверделл")
+    index.lookup("Фотоаппарат Canon EOS 2000D")
+    assert (index.exact_hits, index.near_hits, index.misses) == (1, 0, 1)
+    assert index.saved == 1
@@ -0,0 +1,169 @@
+import sys
+from pathlib import Path
+
+# Ensure project root (parent of tests/) is on sys.path so local modules can be imported
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import scrape_market
+from scrape_market import canonicalize_product_url
+
+
+def test_canonical_url_keeps_its_own_host(monkeypatch):
+    monkeypatch.setattr(scrape_market, "MARKET_HOST", "http://127.0.0.1:8765")
+    url = "https://market.yandex.ru/card/termos/101?do-waremd5=abc&cpc=x"
+    assert canonicalize_product_url(url) == ("https://market.yandex.ru/card/termos/101", "101")
+    assert canonicalize_product_url("//market.yandex.ru/offer/a1B2?cpc=x") == (
+        "https://market.yandex.ru/offer/a1B2",
+        "offer-a1B2",
+    )
+
+
+def test_relative_url_gets_market_host(monkeypatch):
+    monkeypatch.setattr(scrape_market, "MARKET_HOST", "http://127.0.0.1:8765")
+    assert canonicalize_product_url("/card/termos/101?sponsored=1") == (
+        "http://127.0.0.1:8765/card/termos/101",
+        "101",
+    )
+
+
+def test_foreign_urls_are_kept():
+    url = "https://www.ozon.ru/product/termos-101/?sh=x"
+    assert canonicalize_product_url(url) == (url, None)
+
+
+def search_card(title, href, price=None, rating=None):
+    rating_block = ""
+    if rating:
+        rating_block = (
+            f'<div data-zone-name="rating"><span aria-label="Рейтинг {rating} из 5">'
+            f"{rating}</span> <span>(2 500)</span></div>"
+        )
+    price_block = ""
+    if price:
+        price_block = (
+            '<div data-zone-name="price"><span data-auto="snippet-price-current">'
+            f'<span data-auto="price-value">{price}</span> ₽</span></div>'
+        )
+    return (
+        '<article data-auto="searchOrganic"><div data-zone-name="productSnippet">'
+        f'<a data-zone-name="title" href="{href}"><h3 data-auto="snippet-title">{title}</h3></a>'
+        f"{rating_block}{price_block}</div></article>"
+    )
+
+
+def test_best_match_skips_cards_without_price(monkeypatch, tmp_path):
+    from debug_test_alternatives import MockDriver
+
+    monkeypatch.chdir(tmp_path)  # парсер пишет debug_page.html
+    monkeypatch.setattr(scrape_market.time, "sleep", lambda seconds: None)
+    for cascade in scrape_market.ALL_CASCADES:
+        cascade.reset()
+    html = (
+        "<html><body>"
+        # Лучшее совпадение по названию, рейтингу и отзывам, но без цены
+        + search_card("Термос Stanley Classic 1 л", "/card/stanley-classic/1", rating="4,9")
+        + search_card("Термос Stanley Classic 1,4 л зелёный", "/card/stanley-green/2", "4 990")
+        + "</body></html>"
+    )
+    best = scrape_market.find_best_match(MockDriver(html), "Термос Stanley Classic 1 л")
+    assert best["price"] == "4990"
+    assert best["purchaseUrl"].endswith("/card/stanley-green/2")
+
+
+def test_product_and_offer_urls_get_ids():
+    assert canonicalize_product_url(
+        "https://market.yandex.ru/product--termos-stanley/1779420123?sku=1&cpc=x"
+    ) == ("https://market.yandex.ru/product--termos-stanley/1779420123", "1779420123")
+    assert canonicalize_product_url("https://market.yandex.ru/product/42/reviews") == (
+        "https://market.yandex.ru/product/42",
+        "42",
+    )
+    assert canonicalize_product_url(
+        "https://market.yandex.ru/offer/Xy_1-z?do-waremd5=abc"
+    ) == ("https://market.yandex.ru/offer/Xy_1-z", "offer-Xy_1-z")
+
+
+def test_compact_item_replaces_the_product_id():
+    item = {
+        "name": "Термос",
+        "purchaseUrl": "https://market.yandex.ru/card/termos/101?cpc=x",
+        "productId": "999",
+    }
+    compacted = scrape_market.compact_item(item)
+    assert compacted["productId"] == "101"
+    assert compacted["purchaseUrl"] == "https://market.yandex.ru/card/termos/101"
+    assert item["productId"] == "999"  # исходная строка не меняется
+
+    # Ссылка не на товар Маркета - старый productId больше не действует
+    moved = scrape_market.compact_item(dict(item, purchaseUrl="https://www.ozon.ru/product/1/"))
+    assert "productId" not in moved
+
+
+def test_parse_shard():
+    import argparse
+
+    import pytest
+
+    assert scrape_market.parse_shard("2/4") == (2, 4)
+    assert scrape_market.parse_shard(" 1 / 1 ") == (1, 1)
+    for spec in ["0/4", "5/4", "2", "a/b", ""]:
+        with pytest.raises(argparse.ArgumentTypeError):
+            scrape_market.parse_shard(spec)
+
+
+def test_shards_are_stable_and_cover_the_input():
+    names = scrape_market.read_gift_names(Path(__file__).resolve().parents[1] / "200podarkov.txt")
+    shards = [scrape_market.select_shard(names, index, 3) for index in (1, 2, 3)]
+    assert sorted(name for shard in shards for name in shard) == sorted(names)
+    assert all(shards)
+    # Порядок внутри шарда - как во входном списке
+    for shard in shards:
+        assert shard == [name for name in names if name in set(shard)]
+    # Номер шарда зависит только от текста запроса (crc32, а не hash() с солью)
+    assert scrape_market.shard_of("Термос для чая", 4) == scrape_market.shard_of("Термос для чая", 4)
+    assert scrape_market.shard_of("Термос для чая", 4) == scrape_market.shard_of("чая ТЕРМОС, для", 4)
+    assert all(1 <= scrape_market.shard_of(name, 3) <= 3 for name in names)
+
+
+def test_merge_keeps_input_order_and_drops_products_seen_in_other_shards(tmp_path):
+    import json
+
+    names = ["Термос", "Кружка", "Плед", "Лампа"]
+    part1 = tmp_path / "part1.json"
+    part2 = tmp_path / "part2.json"
+    part1.write_text(
+        json.dumps(
+            [
+                {"query": "Плед", "name": "Плед клетчатый", "productId": "3"},
+                {"query": "Термос", "name": "Термос Stanley", "productId": "1"},
+                {"query": "Не из списка", "name": "Что-то", "productId": "9"},
+            ],
+            ensure_ascii=False,
+        ),
+        encoding="utf-8",
+    )
+    part2.write_text(
+        json.dumps(
+            [
+                {"query": "Лампа", "name": "Лампа Stanley", "productId": "1"},
+                {"query": "Кружка", "name": "Кружка без ID"},
+            ],
+            ensure_ascii=False,
+        ),
+        encoding="utf-8",
+    )
+    merged, duplicates = scrape_market.merge_results([str(part1), str(part2)], names)
+    assert [row["query"] for row in merged] == ["Термос", "Кружка", "Плед", "Не из списка"]
+    # Один товар нашёлся в двух шардах - остаётся при более раннем запросе
+    assert duplicates == 1
+    assert merged[0]["name"] == "Термос Stanley"
+
+
+def test_main_defaults_to_scrape(monkeypatch):
+    calls = []
+    monkeypatch.setattr(scrape_market, "run_scrape", lambda args: calls.append(("scrape", args.limit)))
+    monkeypatch.setattr(scrape_market, "run_merge", lambda args: calls.append(("merge", args.results)))
+    scrape_market.main(["--limit", "5"])
+    scrape_market.main([])
+    scrape_market.main(["merge", "part1.json"])
+    assert calls == [("scrape", 5), ("scrape", None), ("merge", ["part1.json"])]
@@ -0,0 +1,56 @@
+import sys
+from pathlib import Path
+
+# Ensure project root (parent of tests/) is on sys.path so local modules can be imported
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from search_index import SearchIndex, stem, term_overlap, tokenize
+
+
+def test_word_forms_share_a_stem():
+    forms = ["медитаций", "медитации", "медитация", "медитацию"]
+    assert len({stem(form) for form in forms}) == 1
+    assert len({stem(form) for form in ["экскурсия", "экскурсии", "экскурсий"]}) == 1
+    assert tokenize("Ёлочные ИГРУШКИ") == tokenize("елочная игрушка")
+
+
+def test_word_forms_match_as_any_term():
+    index = SearchIndex()
+    index.add(1, "Подарочный набор для медитаций")
+    # Не последний термин ищется точно, без префикса
+    assert index.search("медитации набор") == {1}
+    assert index.search("медитация для") == {1}
+
+
+def test_last_term_matches_as_prefix():
+    index = SearchIndex()
+    index.add(1, "Термос для чая")
+    index.add(2, "Термокружка")
+    assert index.search("терм") == {1, 2}
+    assert index.search("для терм") == {1}
+    assert index.search("термос ч") == {1}
+    assert index.search("кофе") == set()
+
+
+def test_add_replace_and_remove():
+    index = SearchIndex()
+    index.add("a", "Термос", None, "для дачи")
+    index.add("b", "Настольная игра")
+    assert index.search("дач") == {"a"}
+
+    index.add("a", "Фотоаппарат Canon")
+    assert len(index) == 2
+    assert index.search("термос") == set()
+    assert index.search("canon") == {"a"}
+
+    index.remove("a")
+    index.remove("unknown")
+    assert index.search("canon") == set()
+    assert "canon" not in index.postings
+    assert index.search("игр") == {"b"}
+
+
+def test_term_overlap():
+    assert term_overlap("набор для медитации", "Подарочный набор для медитаций") == 1.0
+    assert term_overlap("термос для чая", "Термос") == 1 / 3
+    assert term_overlap("", "Термос") == 0.0
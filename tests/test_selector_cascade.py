@@ -0,0 +1,33 @@
+import sys
+from pathlib import Path
+
+# Ensure project root (parent of tests/) is on sys.path so local modules can be imported
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from selector_cascade import SelectorCascade
+
+
+def build_cascade():
+    cascade = SelectorCascade("link", probe_every=0)
+    cascade.register("precise", lambda card: card.get("precise"))
+    cascade.register("broad", lambda card: card.get("broad"))
+    return cascade
+
+
+def test_broad_fallback_never_overtakes_working_precise_strategy():
+    cascade = build_cascade()
+    # Точная стратегия иногда промахивается, общая срабатывает всегда
+    for i in range(100):
+        card = {"broad": "/shop/99"}
+        if i % 2:
+            card["precise"] = "/card/1"
+        cascade.run(card)
+    assert [name for name, _ in cascade.ordered()] == ["precise", "broad"]
+    assert cascade.run({"precise": "/card/1", "broad": "/shop/99"}) == ("/card/1", "precise")
+
+
+def test_failing_prefix_is_skipped():
+    cascade = build_cascade()
+    for _ in range(10):
+        cascade.run({"broad": "/card/2"})
+    assert [name for name, _ in cascade.ordered()] == ["broad", "precise"]
@@ -0,0 +1,42 @@
+import sys
+import threading
+from pathlib import Path
+
+# Ensure project root (parent of tests/) is on sys.path so local modules can be imported
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from single_flight import SingleFlight
+
+
+def test_coalesced_callers_get_their_own_copies():
+    flight = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+    loads = []
+
+    def load():
+        loads.append(1)
+        started.set()
+        release.wait(5)
+        return [{"name": "Термос", "price": None}]
+
+    results = []
+
+    def call():
+        results.append(flight.do("termos", load))
+
+    leader = threading.Thread(target=call)
+    leader.start()
+    started.wait(5)
+    followers = [threading.Thread(target=call) for _ in range(2)]
+    for thread in followers:
+        thread.start()
+    while flight.saved < 2:
+        threading.Event().wait(0.01)
+    release.set()
+    for thread in [leader] + followers:
+        thread.join(5)
+
+    assert len(loads) == 1 and len(results) == 3
+    results[0][0]["price"] = "1990"
+    assert [result[0]["price"] for result in results] == ["1990", None, None]
@@ -0,0 +1,90 @@
+import sys
+from pathlib import Path
+
+# Ensure project root (parent of tests/) is on sys.path so local modules can be imported
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from sources import CatalogSource, Source, SourceRouter
+
+
+class FixedSource(Source):
+    """Answers every query with the same row, like a search engine's first card."""
+
+    def __init__(self, name, row):
+        self.name = name
+        self.row = row
+
+    def lookup(self, query):
+        return dict(self.row, query=query)
+
+
+EXPERIENCES = CatalogSource(
+    [{"name": "Полет в аэротрубе", "price": "3000", "purchaseUrl": "https://example.org/tube"}],
+    name="new_emotions",
+)
+
+
+def test_search_answers_are_not_gated_by_query_terms():
+    # Реальный ответ Маркета: бренд слит с моделью, название не повторяет запрос
+    market = FixedSource(
+        "market",
+        {
+            "name": "Компактный фотоаппарат PaperShoot",
+            "price": "5990",
+            "purchaseUrl": "https://market.yandex.ru/card/papershoot/1",
+        },
+    )
+    router = SourceRouter([EXPERIENCES, market], hedge_after=5.0)
+    item, source_name = router.lookup("Paper Shoot Camera")
+    assert source_name == "market"
+    assert item["name"] == "Компактный фотоаппарат PaperShoot"
+
+
+def test_catalog_rows_must_cover_the_query():
+    market = FixedSource("market", {"name": "Термос", "price": "990", "purchaseUrl": "u"})
+    router = SourceRouter([EXPERIENCES, market], hedge_after=5.0)
+    assert router.lookup("Полет в аэротрубе (сертификат)")[1] == "new_emotions"
+    assert router.lookup("Полет на вертолете над Москвой")[1] == "market"
+
+
+def test_incomplete_answers_are_rejected():
+    market = FixedSource("market", {"name": "Термос", "price": None, "purchaseUrl": "u"})
+    router = SourceRouter([market], hedge_after=5.0)
+    assert router.lookup("Термос") == (None, None)
+    assert router.misses == 1
+
+
+def test_experiences_are_taken_from_catalogs_before_market(tmp_path, monkeypatch):
+    import json
+    import time
+
+    import scrape_market
+
+    monkeypatch.chdir(tmp_path)
+    catalog = tmp_path / "new_emotions.json"
+    catalog.write_text(
+        json.dumps(
+            [
+                {"name": "Прыжок с парашютом", "price": "15000", "purchaseUrl": "https://example.org/jump"},
+                {"name": "Картинг", "price": "2500", "purchaseUrl": "https://example.org/karting"},
+            ],
+            ensure_ascii=False,
+        ),
+        encoding="utf-8",
+    )
+
+    def market_lookup(self, query):
+        # Маркет отвечает быстрее hedge_after, но карточкой-сувениром
+        time.sleep(0.3)
+        return {"name": "Брелок парашют", "price": "290", "purchaseUrl": "https://market.yandex.ru/card/1", "query": query}
+
+    monkeypatch.setattr(scrape_market.MarketSource, "lookup", market_lookup)
+    router = scrape_market.build_router(None, [str(catalog)], hedge_after=5.0)
+    assert [source.name for source in router.sources] == ["market", "new_emotions"]
+
+    for query in ["Прыжок с парашютом (сертификат)", "Картинг (сертификат)", "Прыжок с парашютом (сертификат)"]:
+        assert router.lookup(query)[1] == "new_emotions"
+    assert router.wins["emotion"] == {"new_emotions": 3}
+    assert router.direct_hits == 1
+    # Подарки по-прежнему ищутся на Маркете первым делом
+    assert router.ordered("Термос для чая")[0].name == "market"